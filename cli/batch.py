@@ -0,0 +1,89 @@
+import json, re, sys, time
+from collections import defaultdict
+import numpy as np
+from .common import write_json, sha256_file
+from .columnar import (haversine_km, location_component, price_component, quality_component,
+                       needs_component, reweight)
+from .postcodes import normalize
+from .score import MARGIN_KM, output, preset_label, needs_params, reach_bound, settled
+
+# Batch scoring: many queries x many presets in one pass over one loaded
+# registry. Quality is computed once, price once per distinct budget, needs
+# once per distinct needs set and match mode, and distances once per origin postcode (at the
+# group's widest radius). Each (query, preset) ranking is byte-identical to a
+# single `cli.score` run of that query and preset.
+
+def load_queries(path):
+    queries, seen = [], set()
+    for line in path.read_text(encoding='utf-8').splitlines():
+        if not line.strip(): continue
+        q = json.loads(line)
+        qid = re.sub(r'[^A-Za-z0-9._-]', '_', str(q.pop('id', f'q{len(queries):06d}')))
+        if qid in seen: raise ValueError(f'duplicate query id {qid!r} in {path}')
+        seen.add(qid); queries.append((qid, q))
+    return queries
+
+def run(registry, queries, presets, receipts, out_dir, k=5):
+    t0 = time.perf_counter()
+    cols = registry.cols
+    latest_obs = receipts.latest_observed()
+    qual = quality_component(cols.star_overall)
+    price_by_budget, need_by_needs = {}, {}
+    by_origin = defaultdict(list)
+    for n, (qid, q) in enumerate(queries): by_origin[normalize(q.get('postcode'))].append((n, qid, q))
+
+    entries = []
+    for pc in sorted(by_origin):
+        group = by_origin[pc]; origin = registry.postcodes.get(pc)
+        if origin is None:
+            entries += [((n, ''), {"query_id": qid, "error": f"unknown postcode {pc!r}"}) for n, qid, _ in group]
+            continue
+        reach = max(float(q.get('radius_km', 20.0)) + float(q.get('margin_km', MARGIN_KM)) for _, _, q in group)
+        near = registry.index.within(cols, origin, reach)
+        with np.errstate(invalid='ignore'):
+            d_near = haversine_km(origin['lat'], origin['lng'], cols.lat[near], cols.lng[near])
+        d_all = None
+        for n, qid, q in group:
+            radius_km = float(q.get('radius_km', 20.0)); budget = float(q.get('budget_per_day', 100.0))
+            try: needs, must_have, needs_match = needs_params(q)
+            except ValueError as e:
+                entries.append(((n, ''), {"query_id": qid, "error": str(e)})); continue
+            needs = frozenset(needs); margin_km = float(q.get('margin_km', MARGIN_KM))
+            inside = d_near <= radius_km + margin_km
+            pool = cols.rows_with(must_have) if must_have else None
+            if must_have: inside &= np.isin(near, pool, assume_unique=True)
+            def ranked(rows):
+                # (provider ids, components) over rows; distances for rows outside `near` on demand
+                nonlocal d_all
+                if rows is None:
+                    if d_all is None:
+                        with np.errstate(invalid='ignore'):
+                            d_all = haversine_km(origin['lat'], origin['lng'], cols.lat, cols.lng)
+                    rows, d_km = (pool, d_all[pool]) if must_have else (np.arange(len(cols)), d_all)
+                else: d_km = d_near[inside]
+                if budget not in price_by_budget: price_by_budget[budget] = price_component(cols.price, budget)
+                if (needs, needs_match) not in need_by_needs: need_by_needs[needs, needs_match] = needs_component(cols, needs, needs_match)
+                return [cols.provider_ids[i] for i in rows], {
+                    "location": location_component(d_km, radius_km), "price": price_by_budget[budget][rows],
+                    "quality": qual[rows], "needs": need_by_needs[needs, needs_match][rows]}
+            # same candidates as cli.score.candidates(): the near rows stand in
+            # for the pool (all rows, or must_have's) only while they settle the top k
+            rows = near[inside]
+            pooled = not len(rows) or len(rows) == (len(pool) if must_have else len(cols))
+            near_ranked = ranked(None if pooled else rows); pool_ranked = near_ranked if pooled else None
+            for name, weights in presets.items():
+                top = reweight(*near_ranked, weights, k)
+                if not pooled and not settled(top, k, reach_bound(registry, q, weights)):
+                    if pool_ranked is None: pool_ranked = ranked(None)
+                    top = reweight(*pool_ranked, weights, k)
+                path = out_dir/f'{qid}__{name}.json'
+                write_json(path, output(cols.provider_ids, q, preset_label(name), latest_obs, top, receipts, k))
+                entries.append(((n, name), {"query_id": qid, "preset": name, "file": path.name,
+                                            "sha256": sha256_file(path), "size_bytes": path.stat().st_size}))
+    manifest = {"generated_at": latest_obs or "2025-09-08T00:00:00Z", "top_k": k, "presets": sorted(presets),
+                "queries": len(queries), "rankings": [e for _, e in sorted(entries, key=lambda e: e[0])]}
+    write_json(out_dir/'manifest.json', manifest)
+    secs = time.perf_counter() - t0; done = sum(1 for _, e in entries if 'file' in e)
+    print(f'batch: {len(queries)} queries x {len(presets)} presets = {done} rankings in {secs:.3f}s '
+          f'({len(queries) / secs:.1f} queries/s, {done / secs:.1f} rankings/s)', file=sys.stderr)
+    return manifest
@@ -0,0 +1,99 @@
+import argparse, os, platform, shutil, subprocess, sys, tempfile, time
+from pathlib import Path
+from .common import write_json, read_json
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT/'build'/'bench'/'results.json'
+BASELINE = ROOT/'build'/'bench'/'baseline.json'
+SCALES = [1000, 10000]
+THRESHOLD = 0.25
+MIN_WALL_S = 0.25   # ignore wall-time ratios below this: process start-up noise
+
+# Each scale runs in a throwaway copy of the tree (cli/, config/, schemas/ plus
+# synthetic registry/corpus/receipts), so the real artifacts are never touched.
+# Stages run as `python -m cli.<stage>` exactly as the Makefile does; peak RSS
+# and CPU come from the child's rusage (os.wait4). A child's max RSS starts at
+# its parent's, so data generation also runs in subprocesses (cli.synth) and
+# this process stays small.
+
+STAGES = [('ingest', ['cli.ingest']), ('ingest_warm', ['cli.ingest']), ('extract', ['cli.extract']),
+          ('score', ['cli.score', '--no-cache']), ('score_warm', ['cli.score', '--no-cache']), ('digest', ['cli.digest'])]
+# *_warm: the same stage again over unchanged inputs (ingest manifest, compiled
+# registry and spatial index reused). Inputs are back-dated past
+# ingest.RACY_NS so the warm runs trust their stat keys instead of re-hashing
+# files they just saw being written. score runs without the ranking cache in
+# both: the stages measure scoring, not a cache lookup.
+BACKDATE_S = 86400
+
+def run_stage(root, module_args):
+    err = root/'stage.err'
+    with open(err, 'wb') as f:
+        t0 = time.perf_counter()
+        p = subprocess.Popen([sys.executable, '-m', *module_args], cwd=root, stdout=subprocess.DEVNULL, stderr=f)
+        _, status, ru = os.wait4(p.pid, 0)
+        wall = time.perf_counter() - t0
+    p.returncode = os.waitstatus_to_exitcode(status)
+    if p.returncode: sys.exit(f'{" ".join(module_args)} failed:\n{err.read_text()}')
+    return {"wall_s": round(wall, 4), "cpu_s": round(ru.ru_utime + ru.ru_stime, 4), "peak_rss_kb": ru.ru_maxrss}
+
+def bench_scale(n, seed=None, keep=False):
+    root = Path(tempfile.mkdtemp(prefix=f'fogbreaker-bench-{n}-'))
+    synth = lambda *args: run_stage(root, ['cli.synth', *args, *(['--seed', str(seed)] if seed is not None else [])])
+    try:
+        for d in ('cli', 'config', 'schemas'):
+            shutil.copytree(ROOT/d, root/d, ignore=shutil.ignore_patterns('__pycache__'))
+        synth('registry', '--n', str(n), '--out', 'registry/providers.json')
+        synth('corpus', '--n', str(max(1, n // 10)), '--out', 'corpus')
+        docs = [f for f in (root/'corpus').rglob('*') if f.is_file()]
+        old = time.time() - BACKDATE_S
+        for f in [*docs, root/'registry'/'providers.json']: os.utime(f, (old, old))
+        out = {"providers": n, "corpus_files": len(docs), "corpus_bytes": sum(f.stat().st_size for f in docs), "stages": {}}
+        for name, args in STAGES:
+            if name == 'score':
+                # history the digest has to fold in: two synthetic events per provider
+                synth('receipts', '--n', str(2 * n), '--providers', str(n), '--out', 'receipts/events.jsonl')
+            out["stages"][name] = run_stage(root, args)
+        out["receipt_lines"] = sum(1 for _ in open(root/'receipts'/'events.jsonl', 'rb'))
+        return out
+    finally:
+        if keep: print(f'kept {root}', file=sys.stderr)
+        else: shutil.rmtree(root, ignore_errors=True)
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # -> ["<scale> <stage> <metric>: base -> now (+x%)", ...] for metrics over threshold
+    out = []
+    for scale, res in results["scales"].items():
+        base = baseline.get("scales", {}).get(scale)
+        if not base: continue
+        for stage, m in res["stages"].items():
+            b = base["stages"].get(stage)
+            if not b: continue
+            for metric in ('wall_s', 'peak_rss_kb'):
+                if metric == 'wall_s' and b[metric] < MIN_WALL_S: continue
+                if m[metric] > b[metric] * (1 + threshold):
+                    out.append(f'{scale} {stage} {metric}: {b[metric]} -> {m[metric]} (+{m[metric] / b[metric] - 1:.0%})')
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.bench')
+    ap.add_argument('--scales', default=','.join(map(str, SCALES)), help='comma-separated provider counts, 1000..1000000')
+    ap.add_argument('--seed', type=int, help='generator seed (default: cli.synth.SEED)')
+    ap.add_argument('--out', type=Path, default=RESULTS)
+    ap.add_argument('--baseline', type=Path, default=BASELINE)
+    ap.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed slowdown/growth ratio (default 0.25)')
+    ap.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    ap.add_argument('--keep', action='store_true', help='keep the scratch trees')
+    a = ap.parse_args(argv)
+    scales = [int(s) for s in a.scales.split(',') if s]
+    if not all(1000 <= s <= 1_000_000 for s in scales): ap.error('scales must be within 1000..1000000')
+    results = {"python": platform.python_version(), "machine": platform.machine(), "seed": a.seed,
+               "scales": {str(n): bench_scale(n, a.seed, a.keep) for n in scales}}
+    write_json(a.out, results)
+    for n, res in results["scales"].items():
+        print(n, ' '.join(f'{s}={m["wall_s"]}s/{m["peak_rss_kb"] // 1024}MB' for s, m in res["stages"].items()))
+    if a.save_baseline:
+        write_json(a.baseline, results); print(f'baseline -> {a.baseline}'); return
+    if a.baseline.exists():
+        regressions = compare(results, read_json(a.baseline), a.threshold)
+        for r in regressions: print('REGRESSION', r)
+        if regressions: sys.exit(1)
+if __name__ == '__main__': main()
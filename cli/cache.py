@@ -0,0 +1,119 @@
+import argparse, hashlib, os
+from collections import OrderedDict
+from pathlib import Path
+from .common import json_bytes
+ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = ROOT/'build'/'rank_cache'
+# everything a ranking's bytes are computed by: editing any of these is a new
+# cache version, so no stale ranking survives a scoring change
+SCORING_MODULES = ('score', 'columnar', 'fee_math', 'registry', 'spatial', 'postcodes', 'receipts', 'common')
+MAX_ENTRIES = 512
+MAX_BYTES = 64 << 20
+
+# Ranking cache: the exact bytes of a ranking (or of a component matrix),
+# keyed by everything that goes into it -- the scoring code (CACHE_VERSION),
+# the query as written (it is echoed in the output), k, the preset label and
+# weights, the registry's content hash (providers, extracted overlay and
+# postcode table) and the receipts digest (ReceiptReader.digest(): kept in the
+# receipt index, so computing a key never reads the whole log). A change to
+# any input is a different key, so nothing is ever invalidated by hand; stale
+# entries just age out. Two tiers: an in-memory LRU of MAX_ENTRIES, and
+# build/rank_cache/<key>.json bounded to MAX_BYTES, oldest use (mtime)
+# evicted first.
+
+def code_version(directory=Path(__file__).parent):
+    h = hashlib.sha256()
+    for name in SCORING_MODULES: h.update(name.encode() + b'\0' + (directory/f'{name}.py').read_bytes())
+    return h.hexdigest()
+CACHE_VERSION = code_version()
+
+def key(query, preset, weights, k, registry_sha256, receipts_digest, kind='top5'):
+    # kind: what the bytes are -- 'top5' (a ranking) or 'matrix' (cli.score.matrix)
+    return hashlib.sha256(json_bytes({"version": CACHE_VERSION, "kind": kind, "query": query, "preset": preset, "weights": weights, "k": k,
+                                      "registry": registry_sha256, "receipts": receipts_digest})).hexdigest()
+
+class RankingCache:
+    def __init__(self, directory=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.dir, self.max_entries, self.max_bytes = Path(directory), max_entries, max_bytes
+        self.memory = OrderedDict()
+        self.memory_hits = self.disk_hits = self.misses = 0
+        self._disk_bytes = None
+
+    def get(self, k):
+        if k in self.memory:
+            self.memory.move_to_end(k); self.memory_hits += 1
+            return self.memory[k]
+        path = self.dir/f'{k}.json'
+        try:
+            body = path.read_bytes(); os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.disk_hits += 1; self._remember(k, body)
+        return body
+
+    def put(self, k, body):
+        self._remember(k, body)
+        if self.max_bytes <= 0: return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir/f'{k}.json'; tmp = path.with_name(f'{k}.{os.getpid()}.tmp')
+        total = self.disk_bytes() - (path.stat().st_size if path.exists() else 0)
+        tmp.write_bytes(body); os.replace(tmp, path)
+        self._disk_bytes = total + len(body)
+        if self._disk_bytes > self.max_bytes: self._evict_disk()
+
+    def get_or_put(self, k, compute):
+        # -> ranking bytes; compute() -> bytes on a miss. k None: uncacheable
+        body = None if k is None else self.get(k)
+        if body is None:
+            body = compute()
+            if k is not None: self.put(k, body)
+        return body
+
+    def _remember(self, k, body):
+        self.memory[k] = body; self.memory.move_to_end(k)
+        while len(self.memory) > self.max_entries: self.memory.popitem(last=False)
+
+    def _entries(self):
+        out = []
+        for p in self.dir.glob('*.json'):
+            try: st = p.stat()
+            except OSError: continue
+            out.append((st.st_mtime_ns, p.name, st.st_size, p))
+        return out
+
+    def disk_bytes(self):
+        if self._disk_bytes is None: self._disk_bytes = sum(e[2] for e in self._entries())
+        return self._disk_bytes
+
+    def _evict_disk(self):
+        # oldest use first, down to 3/4 of the bound so evictions come in batches
+        entries = sorted(self._entries()); total = sum(e[2] for e in entries)
+        for _, _, size, p in entries:
+            if total <= self.max_bytes * 3 // 4: break
+            try: p.unlink(); total -= size
+            except OSError: pass
+        self._disk_bytes = total
+
+    def counters(self):
+        return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def stats(self):
+        return {**self.counters(), "memory_entries": len(self.memory), "disk_bytes": self.disk_bytes()}
+
+    def clear(self):
+        self.memory.clear()
+        for *_, p in self._entries(): p.unlink(missing_ok=True)
+        self._disk_bytes = 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.cache')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('stats', help='size of the on-disk ranking cache')
+    sub.add_parser('clear', help='drop every cached ranking')
+    a = ap.parse_args(argv)
+    cache = RankingCache()
+    if a.cmd == 'clear': cache.clear()
+    entries = cache._entries()
+    print(f'{len(entries)} rankings, {sum(e[2] for e in entries)} bytes in {cache.dir.relative_to(ROOT) if cache.dir.is_relative_to(ROOT) else cache.dir}')
+if __name__ == '__main__': main()
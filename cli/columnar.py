@@ -0,0 +1,214 @@
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+import numpy as np
+from .fee_math import dap_batch
+
+# Columnar view of registry/providers.json: one row per provider, NaN = missing.
+# Component maths mirrors the per-provider loop it replaced, op for op, so the
+# rounded fit scores (and therefore rankings/top5.json) stay byte-identical.
+#
+# Tags are interned into a fixed vocabulary (tag -> bit) and stored as one
+# bitset per provider (tag_bits) plus an inverted index, CSR-style: the rows
+# carrying tag bit b are postings[starts[b]:starts[b+1]], ascending.
+
+NEEDS_MATCH = ("any", "overlap")   # needs component: any listed need met | share of needs met
+
+def _num(v):
+    return np.nan if v is None else float(v)
+
+class Columns:
+    def __init__(self, provider_ids, lat, lng, price_per_day, rad, mpir, star_overall, tag_bits, tag_vocab, price=None,
+                 tag_postings=None):
+        self.provider_ids = provider_ids
+        self.lat, self.lng = lat, lng
+        self.price_per_day, self.rad, self.mpir = price_per_day, rad, mpir
+        self.star_overall = star_overall
+        self.tag_bits, self.tag_vocab = tag_bits, tag_vocab
+        self.price = self._effective_price() if price is None else price
+        self.tag_postings = tag_postings   # (starts, postings); None for row subsets
+
+    def __len__(self):
+        return len(self.provider_ids)
+
+    @classmethod
+    def from_providers(cls, providers):
+        providers = providers if isinstance(providers, list) else []
+        vocab = {}
+        for p in providers:
+            for tag in p.get("tags") or []:
+                vocab.setdefault(tag, len(vocab))
+        tag_bits = np.zeros((len(providers), max(1, (len(vocab) + 63) // 64)), dtype=np.uint64)
+        for i, p in enumerate(providers):
+            for tag in p.get("tags") or []:
+                bit = vocab[tag]
+                tag_bits[i, bit // 64] |= np.uint64(1 << (bit % 64))
+        col = lambda key: np.array([_num(p.get(key)) for p in providers], dtype=np.float64)
+        return cls(
+            provider_ids=[p.get("provider_id", "unknown") for p in providers],
+            lat=col("lat"), lng=col("lng"),
+            price_per_day=col("price_per_day"), rad=col("rad"), mpir=col("mpir"),
+            star_overall=col("star_overall"),
+            tag_bits=tag_bits, tag_vocab=vocab, tag_postings=postings(tag_bits, len(vocab)),
+        )
+
+    def slice(self, lo, hi):
+        # views, not copies (provider_ids aside)
+        return self.take(slice(lo, hi))
+
+    def take(self, rows):
+        return Columns(
+            provider_ids=self.provider_ids[rows] if isinstance(rows, slice) else [self.provider_ids[i] for i in rows],
+            lat=self.lat[rows], lng=self.lng[rows],
+            price_per_day=self.price_per_day[rows], rad=self.rad[rows], mpir=self.mpir[rows],
+            star_overall=self.star_overall[rows],
+            tag_bits=self.tag_bits[rows], tag_vocab=self.tag_vocab, price=self.price[rows],
+        )
+
+    def _effective_price(self):
+        # explicit price wins; else RAD/MPIR → DAP; else NaN (neutral 0.5 later)
+        price = self.price_per_day.copy()
+        todo = np.isnan(price)
+        price[todo] = dap_batch(self.rad[todo], self.mpir[todo])
+        return price
+
+    def needs_mask(self, needs):
+        mask = np.zeros(self.tag_bits.shape[1], dtype=np.uint64)
+        for tag in needs:
+            bit = self.tag_vocab.get(tag)
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def rows_with(self, tags):
+        # rows carrying every tag, ascending: posting-list intersection, rarest
+        # tag first, each step a binary search of the survivors into the next list
+        if not tags: return np.arange(len(self))
+        if any(t not in self.tag_vocab for t in tags): return np.zeros(0, dtype=np.int64)
+        if self.tag_postings is None:
+            mask = self.needs_mask(tags)
+            return np.flatnonzero(np.all(self.tag_bits & mask == mask, axis=1))
+        starts, rows = self.tag_postings
+        lists = sorted((rows[starts[b]:starts[b + 1]] for b in {self.tag_vocab[t] for t in tags}), key=len)
+        out = lists[0]
+        for other in lists[1:]:
+            if not len(out): break
+            at = np.minimum(np.searchsorted(other, out), len(other) - 1)
+            out = out[other[at] == out] if len(other) else out[:0]
+        return np.asarray(out, dtype=np.int64)
+
+def postings(tag_bits, n_tags):
+    # inverted index over the tag bitsets -> (starts, postings)
+    per_tag = [np.flatnonzero(tag_bits[:, b // 64] & np.uint64(1 << (b % 64))) for b in range(n_tags)]
+    starts = np.zeros(n_tags + 1, dtype=np.int64); starts[1:] = np.cumsum([len(r) for r in per_tag])
+    return starts, (np.concatenate(per_tag) if per_tag else np.zeros(0)).astype(np.int64)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # vectorised twin of common.haversine_km; keep the two in lockstep
+    R = 6371.0
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    c = 2*np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return R*c
+
+def clamp01(x):
+    return np.maximum(0.0, np.minimum(1.0, x))
+
+# Component functions are split out so batch scoring can reuse whichever parts
+# don't depend on the query; score() is just their composition.
+
+def location_component(d_km, radius_km):
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isnan(d_km), 0.0, 1.0 - clamp01(d_km / max(radius_km, 0.1)))
+
+def price_component(price, budget):
+    with np.errstate(invalid="ignore"):
+        over = clamp01(1.0 - ((price - budget) / max(budget, 1.0)))
+        return np.where(np.isnan(price), 0.5, np.where(price <= budget, 1.0, over))
+
+def quality_component(star_overall):
+    return np.where(np.isnan(star_overall), 0.5, clamp01(star_overall / 5.0))
+
+def needs_component(cols, needs, match="any"):
+    hit = cols.tag_bits & cols.needs_mask(needs)
+    if match == "overlap":
+        # needs missing from the vocabulary count against every provider
+        return np.bitwise_count(hit).sum(axis=1) / len(needs) if needs else np.zeros(len(cols))
+    return np.any(hit, axis=1).astype(np.float64)
+
+def fit_score(weights, loc, price, qual, need_hit):
+    return (
+        weights["w_location"] * loc +
+        weights["w_price"]    * price +
+        weights["w_quality"]  * qual +
+        weights["w_needs"]    * need_hit
+    )
+
+def components(cols, origin, radius_km, budget, needs, needs_match="any"):
+    # the weight-independent part of score()
+    with np.errstate(invalid="ignore"):
+        d_km = haversine_km(origin["lat"], origin["lng"], cols.lat, cols.lng)
+    return {"location": location_component(d_km, radius_km), "price": price_component(cols.price, budget),
+            "quality": quality_component(cols.star_overall), "needs": needs_component(cols, needs, needs_match)}
+
+def score(cols, origin, radius_km, budget, needs, weights, needs_match="any"):
+    comps = components(cols, origin, radius_km, budget, needs, needs_match)
+    comps["fit"] = fit_score(weights, comps["location"], comps["price"], comps["quality"], comps["needs"])
+    return comps
+
+COMPONENTS = ("fit", "location", "price", "quality", "needs")
+CHUNK_ROWS = 1 << 16
+
+def shortlist(fit, k):
+    # Rows that can still make the top k once fit is rounded. Python's round()
+    # is not numpy's, so keep everything within a rounding allowance of the
+    # k-th best raw fit and let the caller order exactly.
+    if len(fit) == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    m = min(k, len(fit))
+    kth = np.partition(fit, len(fit) - m)[len(fit) - m]
+    return np.flatnonzero(fit >= kth - 1e-6)
+
+def best(cols, params, k, base=0):
+    # Streaming bounded top-k: score CHUNK_ROWS rows at a time and keep at most
+    # k hits in a heap. Hit = ((-round(fit, 6), provider_id, row), row, values);
+    # the row in the key keeps equal (fit, id) pairs in registry order, exactly
+    # like the stable full sort this replaces.
+    def chunks():
+        for lo in range(0, len(cols), CHUNK_ROWS):
+            part = cols.slice(lo, lo + CHUNK_ROWS)
+            yield from hits(part.provider_ids, score(part, *params), k, base + lo)
+    return heapq.nsmallest(k, chunks(), key=lambda h: h[0])
+
+def hits(provider_ids, comps, k, base=0):
+    for i in shortlist(comps["fit"], k).tolist():
+        values = {c: float(comps[c][i]) for c in COMPONENTS}
+        yield (-round(values["fit"], 6), provider_ids[i], base + i), base + i, values
+
+def reweight(provider_ids, comps, weights, k):
+    # top-k hits for one weight vector over precomputed components: one dot
+    # product, then the same bounded selection and order as best()
+    comps = dict(comps, fit=fit_score(weights, comps["location"], comps["price"], comps["quality"], comps["needs"]))
+    return heapq.nsmallest(k, hits(provider_ids, comps, k), key=lambda h: h[0])
+
+def best_parallel(cols, params, k, workers):
+    # contiguous shards, one local top-k per worker, deterministic merge on the same key
+    bounds = np.linspace(0, len(cols), workers + 1).astype(int).tolist()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(best, cols.slice(lo, hi), params, k, lo) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+        return heapq.nsmallest(k, chain.from_iterable(f.result() for f in futs), key=lambda h: h[0])
+
+def item(provider_id, values, receipts):
+    return {
+        "provider_id": provider_id,
+        "fit_score": round(values["fit"], 6),
+        "components": {
+            "location": round(values["location"], 6),
+            "price":    round(values["price"],    6),
+            "quality":  round(values["quality"],  6),
+            "needs":    round(values["needs"],    6),
+        },
+        "receipts": receipts,
+    }
@@ -1,15 +1,18 @@
 import json, hashlib, math, datetime
 from pathlib import Path
-def sha256_file(path: Path) -> str:
+def sha256_file(path: Path, bufsize: int = 8192) -> str:
     h = hashlib.sha256()
     with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
+        for chunk in iter(lambda: f.read(bufsize), b''):
             h.update(chunk)
     return h.hexdigest()
 def write_json(path: Path, obj):
     path.parent.mkdir(parents=True, exist_ok=True)
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(obj, f, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+def json_bytes(obj) -> bytes:
+    # exactly what write_json puts on disk
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
 def read_json(path: Path):
     with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
@@ -21,5 +24,5 @@ def haversine_km(lat1, lon1, lat2, lon2):
     dphi = math.radians(lat2 - lat1)
     dlambda = math.radians(lon2 - lon1)
     a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    c = 2*math.atan2(math.sqrt(1-a), math.sqrt(a))
+    c = 2*math.atan2(math.sqrt(a), math.sqrt(1-a))
     return R*c
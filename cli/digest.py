@@ -1,20 +1,136 @@
-import json, hashlib
+import argparse, bisect, json, hashlib, re, sys
 from pathlib import Path
-from .common import write_json
+from .common import write_json, read_json, sha256_file
+from .receipts import ReceiptLog
+from .merkle import MerkleTreap, proof_root
+from .profiling import span, add_arguments, configure
 ROOT = Path(__file__).resolve().parents[1]
 RECEIPTS = ROOT/'receipts'/'events.jsonl'
 LEDGER = ROOT/'ledger'
-def main():
-    if not RECEIPTS.exists(): return
-    lines=[l for l in RECEIPTS.read_text(encoding='utf-8').splitlines() if l.strip()]
+MERKLE = ROOT/'build'/'merkle.sqlite'
+INDEX = LEDGER/'index.json'
+# Ledger chain: digest-<date>.json snapshots the whole log as of that date and
+# links to the previous day's file by sha256 (prev_sha256). Its checkpoint
+# covers the events observed after the previous entry's date: their count,
+# the cumulative count and a digest of their sorted lines. Verifying a day
+# only needs that day's events and its predecessor, not a replay of the
+# log: the log is sorted by content, not time, so the resume point is the
+# receipt index's day -> (offset, length) table rather than one byte offset. Only the newest day's file is ever rewritten; older files are left
+# alone. index.json lists every entry by date, for range queries.
+_TS=re.compile(r'"observed_at":"([^"]*)"')
+def _day(ts, default):
+    return (ts or default).split('T')[0]
+def lines_digest(lines):
+    h=hashlib.sha256()
+    for ln in lines: h.update((ln+'\n').encode('utf-8'))
+    return h.hexdigest()
+def load_index():
+    # [{date, file, sha256, events_count}] by date; rebuilt from the directory if missing
+    try: return read_json(INDEX)['entries']
+    except (OSError, ValueError, KeyError): pass
+    return [_index_entry(p) for p in sorted(LEDGER.glob('digest-*.json'))]
+def _index_entry(path):
+    d=read_json(path)
+    return {'date':d['date'],'file':path.name,'sha256':sha256_file(path),'events_count':d.get('events_count')}
+def build(lines=None, events=None):
+    # lines/events: the merged log (and its parsed events) when a caller already holds them
+    # appended: (digest of the base, the segment lines on top of it), so the
+    # Merkle tree takes just the new lines when it already holds the base
+    appended=None
+    if lines is None:
+        log=ReceiptLog(RECEIPTS)
+        with span('digest.read_log') as s:
+            reader=log.reader()
+            try: lines=list(reader.lines()); appended=(reader.base_digest(), sorted(ln for ln, _ in reader.tail))
+            finally: reader.close()
+            s.add(lines=len(lines), bytes_read=sum(p.stat().st_size for p in log.files()))
     if not lines: return
-    latest_obs='2025-09-08T00:00:00Z'
-    for ln in lines:
-        evt=json.loads(ln); ts=evt.get('observed_at') or latest_obs
-        if ts>latest_obs: latest_obs=ts
+    latest_obs='2025-09-08T00:00:00Z'; stamps=[]
+    with span('digest.parse', lines=len(lines)):
+        for evt in (map(json.loads, lines) if events is None else events):
+            ts=evt.get('observed_at'); stamps.append(ts)
+            if (ts or latest_obs)>latest_obs: latest_obs=ts
     date=latest_obs.split('T')[0]
-    h=hashlib.sha256()
-    for ln in sorted(lines): h.update((ln+'\n').encode('utf-8'))
-    out={'date':date,'events_count':len(lines),'inputs_digest':h.hexdigest()}
-    LEDGER.mkdir(parents=True, exist_ok=True); write_json(LEDGER/f'digest-{date}.json', out)
+    with span('digest.hash', lines=len(lines)):
+        inputs_digest=lines_digest(lines)
+    with span('digest.merkle', lines=len(lines)):
+        tree=MerkleTreap(MERKLE); root=tree.sync(lines, inputs_digest, appended); tree.close()
+    index=[e for e in load_index() if e['date']!=date]
+    prev=max((e for e in index if e['date']<date), key=lambda e: e['date'], default=None)
+    prev_count=read_json(LEDGER/prev['file']).get('checkpoint',{}).get('events_count',0) if prev else 0
+    with span('digest.checkpoint'):
+        day=[ln for ln, ts in zip(lines, stamps) if prev is None or _day(ts, date)>prev['date']]
+    checkpoint={'since':prev['date'] if prev else None,'day_events':len(day),'day_digest':lines_digest(day),'events_count':prev_count+len(day)}
+    out={'date':date,'events_count':len(lines),'inputs_digest':inputs_digest,'merkle_root':root,
+         'prev_sha256':prev['sha256'] if prev else None,'checkpoint':checkpoint}
+    with span('digest.write'):
+        LEDGER.mkdir(parents=True, exist_ok=True); path=LEDGER/f'digest-{date}.json'; write_json(path, out)
+        write_json(INDEX, {'entries':sorted(index+[_index_entry(path)], key=lambda e: e['date'])})
+    return out
+def entries_between(start, end):
+    index=load_index(); dates=[e['date'] for e in index]
+    return index[bisect.bisect_left(dates, start):bisect.bisect_right(dates, end)]
+def verify_day(date, lines=None):
+    # -> list of problems (empty: the entry, its link and its checkpoint hold)
+    index=load_index(); at={e['date']:i for i, e in enumerate(index)}
+    if date not in at: return [f'no ledger entry for {date}']
+    e=index[at[date]]; prev=index[at[date]-1] if at[date] else None
+    path=LEDGER/e['file']; d=read_json(path); cp=d.get('checkpoint') or {}; problems=[]
+    if sha256_file(path)!=e['sha256']: problems.append(f'{e["file"]} does not match its index hash')
+    if d.get('prev_sha256')!=(sha256_file(LEDGER/prev['file']) if prev else None): problems.append('prev_sha256 does not match the previous entry')
+    if cp.get('since')!=(prev['date'] if prev else None): problems.append('checkpoint does not start at the previous entry')
+    prev_count=read_json(LEDGER/prev['file']).get('checkpoint',{}).get('events_count',0) if prev else 0
+    if lines is None:
+        # resume point: the log's day index seeks straight to the day's lines
+        reader=ReceiptLog(RECEIPTS).reader()
+        try: day=reader.lines_between(cp.get('since'), date)
+        finally: reader.close()
+    else:
+        day=[]
+        for ln in lines:
+            m=_TS.search(ln); d_ts=_day(m.group(1) if m else json.loads(ln).get('observed_at'), date)
+            if (cp.get('since') is None or d_ts>cp['since']) and d_ts<=date: day.append(ln)
+    if len(day)!=cp.get('day_events') or lines_digest(day)!=cp.get('day_digest'): problems.append(f"{date}'s events do not match its checkpoint")
+    if cp.get('events_count')!=prev_count+len(day): problems.append('cumulative events_count breaks the chain')
+    return problems
+def prove(event):
+    # event: a receipt as JSON; canonicalised the way ingest/score write them
+    line=json.dumps(json.loads(event), sort_keys=True, separators=(',', ':'))
+    tree=MerkleTreap(MERKLE)
+    try: return tree.prove(line)
+    finally: tree.close()
+def verify(proof, digest):
+    return proof_root(proof)==digest.get('merkle_root')==proof.get('merkle_root')
+def main(argv=None):
+    ap=argparse.ArgumentParser(prog='python -m cli.digest')
+    sub=ap.add_subparsers(dest='cmd')
+    p=sub.add_parser('prove', help='print an inclusion proof for one receipt event')
+    p.add_argument('event', help="event JSON, or '-' to read it from stdin")
+    v=sub.add_parser('verify', help='check an inclusion proof against a published digest')
+    v.add_argument('proof', help="proof JSON file, or '-' for stdin")
+    v.add_argument('--digest', help='ledger digest file (default: newest in ledger/)')
+    d=sub.add_parser('verify-day', help="check one day's ledger entry against its predecessor and that day's events")
+    d.add_argument('date')
+    r=sub.add_parser('range', help='list ledger entries with start <= date <= end (from ledger/index.json)')
+    r.add_argument('start'); r.add_argument('end')
+    add_arguments(ap)
+    a=ap.parse_args(argv)
+    configure(a, 'digest')
+    if a.cmd=='prove':
+        try: proof=prove(sys.stdin.read() if a.event=='-' else a.event)
+        except KeyError: sys.exit('event not in receipt log')
+        print(json.dumps(proof, sort_keys=True, indent=1))
+    elif a.cmd=='verify':
+        proof=json.loads(sys.stdin.read()) if a.proof=='-' else read_json(Path(a.proof))
+        path=Path(a.digest) if a.digest else max(LEDGER.glob('digest-*.json'))
+        if not verify(proof, read_json(path)): sys.exit(f'FAIL: proof does not match {path.name}')
+        print(f'ok: event included in {path.name}')
+    elif a.cmd=='verify-day':
+        problems=verify_day(a.date)
+        if problems: sys.exit('FAIL: '+'; '.join(problems))
+        print(f'ok: {a.date} chains to its predecessor and matches its events')
+    elif a.cmd=='range':
+        print(json.dumps(entries_between(a.start, a.end), sort_keys=True, indent=1))
+    else:
+        with span('digest'): build()
 if __name__ == '__main__': main()
@@ -0,0 +1,96 @@
+import argparse, os, re, sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .common import read_json, write_json
+from .profiling import span, add_arguments, configure
+from . import ingest
+ROOT = Path(__file__).resolve().parents[1]
+CACHE = ROOT/'build'/'extract_cache.json'
+OVERLAY = ROOT/'build'/'registry_overlay.json'
+EXTRACT_VERSION = 1   # bump when a parser changes: every cached entry is dropped
+
+# Pulls structured fields out of the ingested provider documents. Each field
+# remembers the sha256 of the document it came from -- the same sha256 as the
+# document's doc_ingest receipt. Parse results are cached by (document kind,
+# sha256), and the file list comes from ingest's stat-keyed manifest, so a run
+# reads and parses only documents whose content it has not seen before.
+#
+# build/registry_overlay.json: {provider_id: {"fields": {...}, "sources": {field: sha256}}}
+# cli.registry merges "fields" into the providers with matching ids.
+
+_LINE = re.compile(r'^\s*([A-Za-z][A-Za-z ]*?)\s*(?:\d+\s*)?:\s*(.*?)\s*$')
+
+def _number(v):
+    v = v.replace(',', '').lstrip('$')
+    return int(v) if re.fullmatch(r'-?\d+', v) else float(v)
+
+def _pairs(text):
+    for line in text.splitlines():
+        m = _LINE.match(line)
+        if m: yield m.group(1).lower(), m.group(2)
+
+def parse_pricing(text):
+    keys = {'rad': 'rad', 'mpir': 'mpir'}
+    return {keys[k]: _number(v) for k, v in _pairs(text) if k in keys}
+
+def parse_stars(text):
+    keys = {'stars overall': 'star_overall', 'stars clinical': 'star_clinical', 'stars compliance': 'star_compliance'}
+    return {keys[k]: float(_number(v)) for k, v in _pairs(text) if k in keys}
+
+def parse_complaints(text):
+    out, count = {}, 0
+    for k, v in _pairs(text):
+        if k == 'complaints': out['complaints'] = v.lower()
+        elif k == 'complaint': count += 1
+    if count: out['complaints_count'] = count
+    return out
+
+PARSERS = {'pricing.txt': parse_pricing, 'stars.txt': parse_stars, 'complaints.txt': parse_complaints}
+
+def load_cache():
+    try:
+        cache = read_json(CACHE)
+        if cache.get('version') == EXTRACT_VERSION: return cache['entries']
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def _parse(kind, path):
+    try: return PARSERS[kind](path.read_text(encoding='utf-8'))
+    except (OSError, UnicodeDecodeError, ValueError) as e: return {'error': f'{type(e).__name__}: {e}'}
+
+def extract(workers=None, files=None):
+    # -> (overlay, parsed, reused); files: an ingest.scan() result to reuse
+    with span('extract.scan') as s:
+        docs = [(pid, rel, sha) for pid, rel, _, sha in (ingest.scan() if files is None else files) if Path(rel).name in PARSERS]; s.add(files=len(docs))
+    cache = load_cache()
+    todo = {}
+    for pid, rel, sha in docs:
+        key = f'{Path(rel).name}/{sha}'
+        if key not in cache: todo.setdefault(key, rel)
+    with span('extract.parse', files=len(todo)):
+        if todo:
+            with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+                for key, fields in zip(todo, pool.map(lambda k: _parse(k.split('/')[0], ingest.ROOT/todo[k]), todo)): cache[key] = fields
+    overlay, live = {}, {}
+    for pid, rel, sha in docs:
+        key = f'{Path(rel).name}/{sha}'; live[key] = fields = cache[key]
+        if 'error' in fields: print(f'extract: {rel}: {fields["error"]}', file=sys.stderr); continue
+        entry = overlay.setdefault(pid, {'fields': {}, 'sources': {}})
+        for k, v in fields.items(): entry['fields'][k] = v; entry['sources'][k] = sha
+    with span('extract.write', providers=len(overlay)):
+        # only entries for documents still in the corpus are kept
+        if todo or live.keys() != cache.keys(): write_json(CACHE, {'version': EXTRACT_VERSION, 'entries': live})
+        if not OVERLAY.exists() or read_json(OVERLAY) != overlay: write_json(OVERLAY, overlay)
+    return overlay, len(todo), len(docs) - len(todo)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.extract')
+    ap.add_argument('--workers', type=int, help='parser threads')
+    add_arguments(ap)
+    a = ap.parse_args(argv)
+    configure(a, 'extract')
+    with span('extract'):
+        overlay, parsed, reused = extract(a.workers)
+    print(f'{len(overlay)} providers, {parsed} documents parsed, {reused} from cache -> {OVERLAY.relative_to(ROOT)}')
+if __name__ == '__main__': main()
@@ -1,7 +1,97 @@
-from decimal import Decimal, ROUND_HALF_UP, getcontext
+import re
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation, getcontext
+from functools import lru_cache
+import numpy as np
 getcontext().prec = 28
-def dap_from_rad(rad: float, mpir_percent: float) -> float:
+
+# DAP = RAD x MPIR% / 365, to the cent, ROUND_HALF_UP. dap_from_rad_decimal is
+# the reference definition; dap_from_rad reproduces it with integer fixed-point
+# arithmetic, including the 28-digit ROUND_HALF_EVEN context rounding after
+# each Decimal operation, so the two agree for every finite input (property
+# tested in tests/test_fee_math.py). Non-finite inputs go to the reference.
+
+PREC = 28
+
+def dap_from_rad_decimal(rad: float, mpir_percent: float) -> float:
     RAD = Decimal(str(rad)); MPIR = Decimal(str(mpir_percent)) / Decimal('100')
     per_day = (RAD * MPIR) / Decimal('365')
     cents = per_day.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     return float(cents)
+
+_NUM = re.compile(r'([+-]?)(\d*)(?:\.(\d*))?(?:[eE]([+-]?\d+))?')
+
+def _parse(x):
+    # str(x) as Decimal reads it -> (negative, coefficient, exponent), or None
+    m = _NUM.fullmatch(str(x))
+    if not m or not (m.group(2) or m.group(3)): return None
+    frac = m.group(3) or ''
+    return m.group(1) == '-', int((m.group(2) or '') + frac or '0'), int(m.group(4) or 0) - len(frac)
+
+def _context_round(c, e):
+    # round coefficient c >= 0 to PREC digits, half-even (the context rounding)
+    drop = len(str(c)) - PREC
+    if drop <= 0: return c, e
+    q, r = divmod(c, 10 ** drop); half = 5 * 10 ** (drop - 1)
+    if r > half or (r == half and q & 1): q += 1
+    return q, e + drop
+
+def _div365(c, e):
+    # c * 10**e / 365, correctly rounded to PREC digits, half-even
+    if c == 0: return 0, e
+    k = max(0, PREC + 4 - len(str(c)))
+    q, r = divmod(c * 10 ** k, 365)
+    drop = len(str(q)) - PREC
+    q2, r2 = divmod(q, 10 ** drop); half = 5 * 10 ** (drop - 1)
+    rem, lim = r2 * 365 + r, half * 365
+    if rem > lim or (rem == lim and q2 & 1): q2 += 1
+    return q2, e - k + drop
+
+def _cents(c, e):
+    # quantize(Decimal('0.01'), ROUND_HALF_UP) of c * 10**e, as an integer cent count
+    if e >= -2: cents = c * 10 ** (e + 2)
+    else:
+        q, r = divmod(c, 10 ** (-2 - e))
+        cents = q + (2 * r >= 10 ** (-2 - e))
+    if cents >= 10 ** PREC: raise InvalidOperation([InvalidOperation])
+    return cents
+
+@lru_cache(maxsize=1 << 16)
+def _dap_cached(rad, mpir):
+    return _dap_exact(rad, mpir)
+
+def _dap_exact(rad, mpir):
+    r, m = _parse(rad), _parse(mpir)
+    if r is None or m is None: return dap_from_rad_decimal(rad, mpir)
+    neg = r[0] != m[0]
+    mc, me = _context_round(m[1], m[2] - 2)              # MPIR / 100
+    pc, pe = _context_round(r[1] * mc, r[2] + me)        # RAD * MPIR
+    cents = _cents(*_div365(pc, pe))                     # / 365, to the cent
+    return -(cents / 100) if neg else cents / 100
+
+def dap_from_rad(rad: float, mpir_percent: float) -> float:
+    # memoised on (rad, mpir); zeros bypass the cache because 0.0 == -0.0 but
+    # the result keeps the sign
+    if rad == 0 or mpir_percent == 0: return _dap_exact(rad, mpir_percent)
+    return _dap_cached(rad, mpir_percent)
+
+def dap_batch(rads, mpirs) -> np.ndarray:
+    # Vectorised DAP over float arrays; NaN in -> NaN out, and NaN where the
+    # scalar engine would raise. Rows whose RAD and MPIR are exact cent-scale
+    # decimals (the registry's normal case) are computed in int64: there the
+    # 28-digit intermediates are exact, so DAP = half-up(N / 3_650_000) cents
+    # with N = (RAD*100) * (MPIR*100). Everything else goes through the memoised
+    # scalar engine once per distinct pair.
+    rads = np.asarray(rads, dtype=np.float64); mpirs = np.asarray(mpirs, dtype=np.float64)
+    out = np.full(rads.shape, np.nan)
+    with np.errstate(invalid='ignore', over='ignore'):
+        nr, nm = np.rint(rads * 100), np.rint(mpirs * 100)
+        fast = ((nr / 100 == rads) & (nm / 100 == mpirs) & (np.abs(rads) < 1e12) & (np.abs(mpirs) < 100))
+    n = np.abs(nr[fast]).astype(np.int64) * np.abs(nm[fast]).astype(np.int64)
+    cents = (2 * n + 3_650_000) // 7_300_000
+    neg = np.signbit(rads[fast]) ^ np.signbit(mpirs[fast])
+    out[fast] = np.where(neg, -(cents / 100), cents / 100)
+    slow = ~fast & ~np.isnan(rads) & ~np.isnan(mpirs)
+    for i in zip(*np.nonzero(slow)):
+        try: out[i] = dap_from_rad(float(rads[i]), float(mpirs[i]))
+        except (ArithmeticError, ValueError): pass
+    return out
@@ -1,21 +1,57 @@
-import json
+import argparse, json, os, time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from .common import sha256_file
+from .common import sha256_file, read_json, write_json
+from .receipts import ReceiptLog
+from .profiling import span, add_arguments, configure
 ROOT = Path(__file__).resolve().parents[1]
 CORPUS = ROOT/'corpus'
 RECEIPTS = ROOT/'receipts'/'events.jsonl'
+MANIFEST = ROOT/'build'/'ingest_manifest.json'
 FIXED_OBSERVED = '2025-09-08T00:00:00Z'
-def main():
-    RECEIPTS.parent.mkdir(parents=True, exist_ok=True)
-    lines = []
+HASH_BUFSIZE = 1 << 20
+# files touched this close to the scan are re-hashed next run (coarse mtime clocks)
+RACY_NS = 2_000_000_000
+def stat_key(st):
+    return {"size":st.st_size,"mtime_ns":st.st_mtime_ns,"ino":st.st_ino}
+def load_manifest():
+    try: return read_json(MANIFEST)
+    except (OSError, ValueError): return {}
+def scan(workers=None):
+    # -> [(provider_id, relpath, stat_key, sha256)] in receipt order; reuses the
+    # manifest's sha256 for files whose (size, mtime_ns, ino) are unchanged
+    started_ns = time.time_ns(); manifest = load_manifest()
+    files = []
     for provider_dir in sorted(CORPUS.glob('*')):
         if not provider_dir.is_dir(): continue
-        provider_id = provider_dir.name
         for f in sorted(provider_dir.glob('*')):
             if f.is_file():
-                sha = sha256_file(f); size = f.stat().st_size
-                evt = {"observed_at":FIXED_OBSERVED,"kind":"doc_ingest","provider_id":provider_id,
-                       "source":{"filename":str(f.relative_to(ROOT))},"sha256":sha,"size_bytes":size}
-                lines.append(json.dumps(evt, sort_keys=True, separators=(',', ':')))
-    RECEIPTS.write_text('\n'.join(lines) + ('\n' if lines else ''), encoding='utf-8')
+                rel = str(f.relative_to(ROOT)); key = stat_key(f.stat()); old = manifest.get(rel)
+                sha = old['sha256'] if old and all(old.get(k)==v for k,v in key.items()) else None
+                files.append([provider_dir.name, rel, key, sha])
+    todo = [e for e in files if e[3] is None]
+    with span('ingest.hash', files=len(todo), bytes_read=sum(e[2]['size'] for e in todo), reused=len(files) - len(todo)):
+        if todo:
+            with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+                for e, sha in zip(todo, pool.map(lambda e: sha256_file(ROOT/e[1], HASH_BUFSIZE), todo)): e[3] = sha
+    fresh = {rel:dict(key, sha256=sha) for _, rel, key, sha in files if key['mtime_ns'] < started_ns - RACY_NS}
+    if fresh != manifest:
+        write_json(MANIFEST.with_suffix('.tmp'), fresh); os.replace(MANIFEST.with_suffix('.tmp'), MANIFEST)
+    return files
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.ingest')
+    add_arguments(ap)
+    configure(ap.parse_args(argv), 'ingest')
+    with span('ingest'):
+        with span('ingest.scan') as s:
+            files = scan(); s.add(files=len(files))
+        ReceiptLog(RECEIPTS).reset(event_lines(files))
+def event_lines(files):
+    lines = []
+    with span('ingest.encode', lines=len(files)):
+        for provider_id, rel, key, sha in files:
+            evt = {"observed_at":FIXED_OBSERVED,"kind":"doc_ingest","provider_id":provider_id,
+                   "source":{"filename":rel},"sha256":sha,"size_bytes":key['size']}
+            lines.append(json.dumps(evt, sort_keys=True, separators=(',', ':')))
+    return lines
 if __name__ == '__main__': main()
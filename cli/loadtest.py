@@ -0,0 +1,56 @@
+import argparse, asyncio, json, math, random, time
+from urllib.parse import urlencode
+
+# Closed-loop load generator for cli.serve: `concurrency` keep-alive clients
+# share `requests` queries drawn from a fixed seed, then p50/p90/p99 latency
+# and throughput are printed as one JSON object.
+
+POSTCODES = ['2000', '2010', '2611', '3000', '4000', '6000']
+NEEDS = ['', 'memory_support', 'secure_unit', 'memory_support,secure_unit']
+
+def queries(n, presets, seed=0):
+    r = random.Random(seed)
+    return ['/top5?' + urlencode({'postcode':r.choice(POSTCODES), 'radius_km':r.choice([5, 10, 20, 50]),
+                                  'budget_per_day':r.choice([60, 90, 120]), 'needs':r.choice(NEEDS),
+                                  'preset':r.choice(presets)}) for _ in range(n)]
+
+def percentile(sorted_ms, p):
+    return sorted_ms[max(0, math.ceil(p / 100 * len(sorted_ms)) - 1)] if sorted_ms else None
+
+async def _client(host, port, todo, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while todo:
+            target = todo.pop()
+            t0 = time.perf_counter()
+            writer.write(f'GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1'))
+            status = int((await reader.readline()).split()[1]); length = 0
+            while (h := await reader.readline()) not in (b'\r\n', b''):
+                k, _, v = h.decode('latin-1').partition(':')
+                if k.lower() == 'content-length': length = int(v)
+            await reader.readexactly(length)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status != 200: errors.append(status)
+    finally:
+        writer.close()
+
+async def run(host, port, n, concurrency, presets, seed=0):
+    todo = queries(n, presets, seed)[::-1]; latencies, errors = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, todo, latencies, errors) for _ in range(concurrency)])
+    wall = time.perf_counter() - t0; ms = sorted(latencies)
+    return {'requests':len(ms), 'errors':len(errors), 'concurrency':concurrency, 'wall_s':round(wall, 3),
+            'rps':round(len(ms) / wall, 1) if wall else None,
+            **{f'p{p}_ms':round(percentile(ms, p), 3) for p in (50, 90, 99)}, 'max_ms':round(ms[-1], 3)}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.loadtest')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8080)
+    ap.add_argument('--requests', type=int, default=2000)
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--presets', default='balanced', help='comma-separated preset names')
+    ap.add_argument('--seed', type=int, default=0)
+    a = ap.parse_args(argv)
+    print(json.dumps(asyncio.run(run(a.host, a.port, a.requests, a.concurrency, a.presets.split(','), a.seed))))
+if __name__ == '__main__': main()
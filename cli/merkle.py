@@ -0,0 +1,195 @@
+import hashlib, json, sqlite3
+from itertools import groupby
+from pathlib import Path
+
+# Merkle treap over the sorted receipt lines. Each node is one distinct line
+# (with a multiplicity), in-order traversal is the sorted log, and the heap
+# priority is the line's leaf hash, so the tree shape -- and the root -- depend
+# only on the set of lines, never on insertion order. Inserting or deleting a
+# line rehashes one root-to-node path: O(log n) expected.
+#
+#   leaf(line)  = sha256(0x00 || utf8(line))
+#   node        = sha256(0x01 || left || leaf || count (u64 BE) || right)
+#   empty child = 32 zero bytes
+#
+# Nodes persist in SQLite so a digest run only loads the paths it touches.
+
+EMPTY = bytes(32)
+
+def leaf_hash(line: str) -> bytes:
+    return hashlib.sha256(b'\x00' + line.encode('utf-8')).digest()
+
+def node_hash(left: bytes, leaf: bytes, count: int, right: bytes) -> bytes:
+    return hashlib.sha256(b'\x01' + left + leaf + count.to_bytes(8, 'big') + right).digest()
+
+class MerkleTreap:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute('CREATE TABLE IF NOT EXISTS node (line TEXT PRIMARY KEY, count INTEGER, leaf BLOB, hash BLOB, lo TEXT, hi TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)')
+        row = self.db.execute("SELECT v FROM meta WHERE k='root'").fetchone()
+        self.root = row[0] if row else None
+        self._cache, self._dirty, self._gone = {}, set(), set()
+
+    def close(self):
+        self.db.close()
+
+    # -- node access ---------------------------------------------------------
+    def _get(self, line):
+        n = self._cache.get(line)
+        if n is None:
+            r = self.db.execute('SELECT count, leaf, hash, lo, hi FROM node WHERE line=?', (line,)).fetchone()
+            n = self._cache[line] = {'count':r[0], 'leaf':bytes(r[1]), 'hash':bytes(r[2]), 'lo':r[3], 'hi':r[4]}
+        return n
+
+    def _hash(self, line):
+        return EMPTY if line is None else self._get(line)['hash']
+
+    def _touch(self, line):
+        n = self._get(line)
+        n['hash'] = node_hash(self._hash(n['lo']), n['leaf'], n['count'], self._hash(n['hi']))
+        self._dirty.add(line); self._gone.discard(line)
+
+    # -- treap operations -----------------------------------------------------
+    # Iterative: walk down recording the path, then relink and rehash it bottom-up.
+    def _path(self, line):
+        path, t = [], self.root
+        while t is not None and t != line:
+            path.append(t); t = self._get(t)['lo' if line < t else 'hi']
+        return path, t
+
+    def _relink(self, path, line, t):
+        # hang subtree t back under each ancestor of line's position, rehashing as it goes
+        while path:
+            p = path.pop(); self._get(p)['lo' if line < p else 'hi'] = t; self._touch(p); t = p
+        self.root = t
+
+    def insert(self, line):
+        path, t = self._path(line)
+        if t is None:
+            t = line; self._cache[line] = {'count':1, 'leaf':leaf_hash(line), 'hash':None, 'lo':None, 'hi':None}
+        else:
+            self._get(t)['count'] += 1
+        self._touch(t)
+        # rotate the node up while its priority beats its parent's
+        while path and self._get(t)['leaf'] > self._get(path[-1])['leaf']:
+            p = path.pop(); n, c = self._get(p), self._get(t)
+            side, other = ('lo', 'hi') if line < p else ('hi', 'lo')
+            n[side] = c[other]; self._touch(p)
+            c[other] = p; self._touch(t)
+        self._relink(path, line, t)
+
+    def _merge(self, a, b):
+        # join two treaps, every line of a below every line of b
+        spine = []
+        while a is not None and b is not None:
+            if self._get(a)['leaf'] > self._get(b)['leaf']: spine.append((a, 'hi')); a = self._get(a)['hi']
+            else: spine.append((b, 'lo')); b = self._get(b)['lo']
+        t = b if a is None else a
+        while spine:
+            p, side = spine.pop(); self._get(p)[side] = t; self._touch(p); t = p
+        return t
+
+    def delete(self, line):
+        path, t = self._path(line)
+        if t is None: raise KeyError(line)
+        n = self._get(t)
+        if n['count'] > 1:
+            n['count'] -= 1; self._touch(t)
+        else:
+            self._dirty.discard(t); self._gone.add(t)
+            t = self._merge(n['lo'], n['hi'])
+        self._relink(path, line, t)
+
+    def root_hash(self) -> str:
+        return self._hash(self.root).hex()
+
+    def commit(self, synced=None):
+        self.db.executemany('DELETE FROM node WHERE line=?', [(l,) for l in self._gone])
+        self.db.executemany('INSERT OR REPLACE INTO node VALUES (?,?,?,?,?,?)',
+            [(l, n['count'], n['leaf'], n['hash'], n['lo'], n['hi']) for l in sorted(self._dirty) for n in [self._cache[l]]])
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (self.root,))
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('synced', ?)", (json.dumps(synced),))
+        self.db.commit()
+        self._dirty.clear(); self._gone.clear()
+
+    def synced(self):
+        # [digest, line count] of the log the tree was last synced to; None if unknown
+        row = self.db.execute("SELECT v FROM meta WHERE k='synced'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _build(self, counted):
+        # Cartesian-tree construction from sorted (line, count): O(n), every
+        # node hashed once. Used for a first build or when most lines changed.
+        self.db.execute('DELETE FROM node'); self._cache, self._dirty, self._gone = {}, set(), set()
+        stack = []
+        for line, count in counted:
+            n = self._cache[line] = {'count':count, 'leaf':leaf_hash(line), 'hash':None, 'lo':None, 'hi':None}
+            last = None
+            while stack and self._cache[stack[-1]]['leaf'] < n['leaf']: last = stack.pop()
+            n['lo'] = last
+            if stack: self._cache[stack[-1]]['hi'] = line
+            stack.append(line)
+        self.root = stack[0] if stack else None
+        todo = [(self.root, False)] if self.root is not None else []
+        while todo:
+            t, children_done = todo.pop()
+            if children_done: self._touch(t); continue
+            todo.append((t, True))
+            todo += [(c, False) for c in (self._cache[t]['lo'], self._cache[t]['hi']) if c is not None]
+
+    # -- sync / proofs --------------------------------------------------------
+    def stored(self):
+        return self.db.execute('SELECT line, count FROM node ORDER BY line')
+
+    def sync(self, sorted_lines, digest=None, appended=None) -> str:
+        # digest: the caller's digest of sorted_lines (cli.digest.lines_digest).
+        # Unchanged since the last sync: nothing to do. appended: (digest of a
+        # log, lines added to it since); if the tree holds that log, only the
+        # added lines are inserted. Otherwise walk stored (line, count) and the
+        # sorted log side by side; only the differences touch the tree. The walk
+        # is a scan, the hashing O(k log n).
+        synced = self.synced() if digest is not None else None
+        if synced == [digest, len(sorted_lines)]: return self.root_hash()
+        if synced is not None and appended is not None and synced == [appended[0], len(sorted_lines) - len(appended[1])]:
+            for l in appended[1]: self.insert(l)
+            self.commit([digest, len(sorted_lines)])
+            return self.root_hash()
+        counted = [(line, sum(1 for _ in g)) for line, g in groupby(sorted_lines)]
+        added, removed, stored_n = [], [], 0
+        stored = iter(self.stored()); cur = next(stored, None)
+        for line, n in counted:
+            while cur is not None and cur[0] < line:
+                removed += [cur[0]] * cur[1]; stored_n += 1; cur = next(stored, None)
+            have = 0
+            if cur is not None and cur[0] == line:
+                have = cur[1]; stored_n += 1; cur = next(stored, None)
+            added += [line] * max(0, n - have); removed += [line] * max(0, have - n)
+        while cur is not None:
+            removed += [cur[0]] * cur[1]; stored_n += 1; cur = next(stored, None)
+        if len(added) + len(removed) > stored_n // 2:
+            self._build(counted)
+        else:
+            for l in removed: self.delete(l)
+            for l in added: self.insert(l)
+        self.commit(None if digest is None else [digest, len(sorted_lines)])
+        return self.root_hash()
+
+    def prove(self, line):
+        path, t = [], self.root
+        while t is not None and t != line:
+            n = self._get(t)
+            if line < t: path.append({'side':'lo', 'sibling':self._hash(n['hi']).hex(), 'leaf':n['leaf'].hex(), 'count':n['count']}); t = n['lo']
+            else: path.append({'side':'hi', 'sibling':self._hash(n['lo']).hex(), 'leaf':n['leaf'].hex(), 'count':n['count']}); t = n['hi']
+        if t is None: raise KeyError(line)
+        n = self._get(t)
+        return {'line':line, 'count':n['count'], 'lo':self._hash(n['lo']).hex(), 'hi':self._hash(n['hi']).hex(),
+                'path':path[::-1], 'merkle_root':self.root_hash()}
+
+def proof_root(proof) -> str:
+    h = node_hash(bytes.fromhex(proof['lo']), leaf_hash(proof['line']), proof['count'], bytes.fromhex(proof['hi']))
+    for step in proof['path']:
+        sib, leaf = bytes.fromhex(step['sibling']), bytes.fromhex(step['leaf'])
+        h = node_hash(h, leaf, step['count'], sib) if step['side'] == 'lo' else node_hash(sib, leaf, step['count'], h)
+    return h.hex()
@@ -0,0 +1,111 @@
+import argparse, bisect, hashlib, json, sys, time
+from pathlib import Path
+from .common import read_json, write_json, sha256_file
+from .profiling import span, add_arguments, configure
+from .receipts import ReceiptLog, MemoryReader, validate
+from .cache import RankingCache
+from . import ingest, extract, score, digest, postcodes
+ROOT = Path(__file__).resolve().parents[1]
+STATE = ROOT/'build'/'pipeline_state.json'
+
+# `make all` in one process, as a DAG over recorded input/output digests:
+#
+#   corpus ──> extract ──> overlay ─┐
+#     │                            v
+#     └──> ingest -> validate -> score -> digest -> compact
+#   registry, preset, query, postcodes ─┘
+#
+# ingest resets the receipt log and score appends its score_run receipt to the
+# fresh log, so the two (with validate and compact) form one "receipts" stage:
+# running either alone would leave a log `make all` never produces. Parsed
+# events flow from ingest to score and digest in memory. A stage is skipped
+# when its inputs digest and its outputs are what the last run recorded, so a
+# no-op run costs a manifest scan and a few stats. Artifacts are byte-identical
+# to the Makefile path.
+
+def _rel(path):
+    path = Path(path)
+    return str(path.relative_to(ROOT)) if path.is_relative_to(ROOT) else str(path)
+
+class Digests:
+    # sha256 per file, memoised on (size, mtime_ns, ino) across runs
+    def __init__(self, memo):
+        self.memo, self.started_ns = memo, time.time_ns()
+
+    def sha(self, path):
+        try: st = Path(path).stat()
+        except FileNotFoundError: return None
+        key = [st.st_size, st.st_mtime_ns, st.st_ino]
+        m = self.memo.get(_rel(path))
+        if m and m[:3] == key: return m[3]
+        sha = sha256_file(path)
+        if st.st_mtime_ns < self.started_ns - ingest.RACY_NS: self.memo[_rel(path)] = key + [sha]
+        else: self.memo.pop(_rel(path), None)
+        return sha
+
+    def files(self, paths):
+        return {_rel(p): self.sha(p) for p in paths}
+
+def _digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode('utf-8')).hexdigest()
+
+def run(force=False, workers=None):
+    # -> {stage: 'ran' | 'skipped'}
+    try: state = read_json(STATE)
+    except (OSError, ValueError): state = {}
+    stages, files, status = state.get('stages', {}), Digests(state.get('files', {})), {}
+    fresh = lambda name, inputs, outputs: not force and stages.get(name) == {'inputs': inputs, 'outputs': outputs}
+    log = ReceiptLog(ingest.RECEIPTS)
+
+    with span('pipeline.scan') as s:
+        scanned = ingest.scan(); s.add(files=len(scanned))
+    corpus = _digest([(rel, sha) for _, rel, _, sha in scanned])
+
+    inputs = {'corpus': corpus}
+    if fresh('extract', inputs, files.files([extract.OVERLAY])): status['extract'] = 'skipped'
+    else:
+        extract.extract(workers, scanned)
+        stages['extract'] = {'inputs': inputs, 'outputs': files.files([extract.OVERLAY])}; status['extract'] = 'ran'
+
+    receipts_inputs = {'corpus': corpus, **files.files([score.REGISTRY, extract.OVERLAY, score.PRESETS/'balanced.json', score.QUERY, postcodes.POSTCODES_CSV])}
+    lines = events = None
+    if fresh('receipts', receipts_inputs, files.files([score.RANKINGS, *log.files()])): status['receipts'] = 'skipped'
+    else:
+        lines = sorted(ingest.event_lines(scanned))
+        log.reset(lines, sort=False)
+        report = validate(log, workers=workers)
+        if report['error_count']: sys.exit('\n'.join(report['errors'] + ['receipt log failed validation']))
+        with span('pipeline.parse', lines=len(lines)):
+            events = [json.loads(l) for l in lines]
+        _, line = score.run(receipts=MemoryReader(lines, events), ranking_cache=RankingCache())
+        i = bisect.bisect_right(lines, line); lines.insert(i, line); events.insert(i, json.loads(line))
+        status['receipts'] = 'ran'
+
+    inputs = {'receipts': files.files(log.files())}
+    ledger = stages.get('digest', {}).get('outputs', {})
+    if lines is None and fresh('digest', inputs, files.files(ROOT/p for p in ledger)): status['digest'] = 'skipped'
+    else:
+        out = digest.build(lines, events)
+        ledger = [digest.LEDGER/f'digest-{out["date"]}.json', digest.INDEX] if out else []
+        stages['digest'] = {'inputs': inputs, 'outputs': files.files(ledger)}; status['digest'] = 'ran'
+
+    if lines is not None:
+        log.reset(lines, sort=False)   # compact: the merged view is already in memory
+        stages['receipts'] = {'inputs': receipts_inputs, 'outputs': files.files([score.RANKINGS, *log.files()])}
+        stages['digest']['inputs'] = {'receipts': files.files(log.files())}
+
+    write_json(STATE, {'stages': stages, 'files': files.memo})
+    return status
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.pipeline')
+    ap.add_argument('--force', action='store_true', help='run every stage even if its inputs are unchanged')
+    ap.add_argument('--workers', type=int, help='hashing/parsing threads and validator processes')
+    add_arguments(ap)
+    a = ap.parse_args(argv)
+    configure(a, 'pipeline')
+    t0 = time.perf_counter()
+    with span('pipeline'):
+        status = run(a.force, a.workers)
+    print(' '.join(f'{k}={v}' for k, v in status.items()), f'({time.perf_counter() - t0:.3f}s)')
+if __name__ == '__main__': main()
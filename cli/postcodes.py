@@ -0,0 +1,99 @@
+import argparse, csv, mmap, os, re
+from pathlib import Path
+import numpy as np
+from .common import sha256_file
+ROOT = Path(__file__).resolve().parents[1]
+POSTCODES_CSV = ROOT/'config'/'postcodes.csv'
+POSTCODES_BIN = ROOT/'build'/'postcodes.bin'
+
+# Compiled postcode -> (lat, lng) centroid table. Layout (little-endian):
+#   header  b'FBPC0001' | u64 count | sha256 of the source CSV (32 bytes)
+#   records count x (key: 8 ASCII bytes, NUL-padded | lat f8 | lng f8), sorted by key
+# Readers mmap the file and binary-search the keys in place, so every process
+# shares one page-cache copy and nothing is parsed at startup.
+#
+# config/postcodes.csv is not an official postcode gazetteer (none is
+# vendored here). Its `source` column says where each row came from:
+#   provider_mean  the mean lat/lng of the registry's providers in that
+#                  postcode -- roughly where its facilities are, not the
+#                  postcode's area centroid
+#   city_centre    the city-centre coordinates of the capital CBD postcodes
+#                  (0800, 2000, 2600, 3000, 4000, 5000)
+# Postcodes with no facility and no CBD entry are missing and answer
+# "unknown postcode"; extending coverage means appending rows to the CSV.
+
+MAGIC = b'FBPC0001'
+HEADER = 8 + 8 + 32
+RECORD = np.dtype([('key', 'S8'), ('lat', '<f8'), ('lng', '<f8')])
+
+def normalize(postcode) -> str:
+    pc = str(postcode).strip()
+    if re.fullmatch(r'\d+\.0', pc): pc = pc[:-2]
+    return pc.zfill(4) if pc.isdigit() else pc.upper()
+
+def build(csv_path=POSTCODES_CSV, out=POSTCODES_BIN):
+    rows = {}
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for r in csv.DictReader(f):
+            pc = normalize(r['postcode'])
+            if len(pc.encode('ascii')) > 8: raise ValueError(f'postcode {pc!r} longer than 8 bytes')
+            if pc in rows: raise ValueError(f'duplicate postcode {pc!r} in {csv_path}')
+            rows[pc] = (float(r['lat']), float(r['lng']))
+    recs = np.array([(pc.encode('ascii'), *rows[pc]) for pc in sorted(rows, key=lambda k: k.encode('ascii'))], dtype=RECORD)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + len(recs).to_bytes(8, 'little') + bytes.fromhex(sha256_file(csv_path)))
+        f.write(recs.tobytes())
+    os.replace(tmp, out)
+    return len(recs)
+
+class PostcodeTable:
+    def __init__(self, path=POSTCODES_BIN):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC: raise ValueError(f'{path} is not a postcode table')
+        n = int.from_bytes(self._mm[8:16], 'little')
+        self.source_sha256 = self._mm[16:HEADER].hex()
+        self._recs = np.frombuffer(self._mm, dtype=RECORD, count=n, offset=HEADER)
+
+    def __len__(self):
+        return len(self._recs)
+
+    def get(self, postcode):
+        key = normalize(postcode).encode('ascii', 'replace')
+        i = int(np.searchsorted(self._recs['key'], key))
+        if i < len(self._recs) and self._recs['key'][i] == key:
+            return {"lat": float(self._recs['lat'][i]), "lng": float(self._recs['lng'][i])}
+        return None
+
+    def origin(self, postcode):
+        o = self.get(postcode)
+        if o is None: raise ValueError(f'unknown postcode {postcode!r}')
+        return o
+
+def load(csv_path=POSTCODES_CSV, path=POSTCODES_BIN):
+    # compile on first use and whenever the CSV's content changes
+    try:
+        table = PostcodeTable(path)
+        if table.source_sha256 == sha256_file(csv_path): return table
+    except (OSError, ValueError):
+        pass
+    build(csv_path, path)
+    return PostcodeTable(path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.postcodes')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help='compile the CSV (postcode,lat,lng) into the binary table')
+    b.add_argument('--csv', type=Path, default=POSTCODES_CSV)
+    b.add_argument('--out', type=Path, default=POSTCODES_BIN)
+    l = sub.add_parser('lookup', help='print the centroid of one or more postcodes')
+    l.add_argument('postcode', nargs='+')
+    a = ap.parse_args(argv)
+    if a.cmd == 'build':
+        print(f'{build(a.csv, a.out)} postcodes -> {a.out}')
+    else:
+        table = load()
+        for pc in a.postcode: print(normalize(pc), table.get(pc))
+if __name__ == '__main__': main()
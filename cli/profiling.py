@@ -0,0 +1,70 @@
+import cProfile, json, os, sys, time
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+METRICS = ROOT/'build'/'metrics.jsonl'
+PROFILE_ENV = 'FOGBREAKER_PROFILE'   # 1/true/yes -> record spans
+PSTATS_ENV = 'FOGBREAKER_PSTATS'     # span name -> also cProfile it
+
+# Timed spans for the pipeline stages. Off by default: span() then returns one
+# shared no-op object, so instrumented code pays a function call and nothing
+# else. When on, every span appends one JSON line to build/metrics.jsonl with
+# wall/CPU time and whatever counters the code attached (files, lines,
+# bytes_read, bytes_written, ...). Nothing here writes under rankings/,
+# receipts/ or ledger/.
+
+_on = os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+_pstats = os.environ.get(PSTATS_ENV) or None
+_program = Path(sys.argv[0]).stem
+
+class _Null:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def add(self, **counters): pass
+
+NULL = _Null()
+
+class Span:
+    __slots__ = ('name', 'counters', 't0', 'c0', 'prof')
+    def __init__(self, name, counters):
+        self.name, self.counters, self.prof = name, counters, None
+
+    def add(self, **counters):
+        for k, v in counters.items(): self.counters[k] = self.counters.get(k, 0) + v
+
+    def __enter__(self):
+        if self.name == _pstats:
+            self.prof = cProfile.Profile(); self.prof.enable()
+        self.t0, self.c0 = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.t0, time.process_time() - self.c0
+        if self.prof is not None:
+            self.prof.disable(); METRICS.parent.mkdir(parents=True, exist_ok=True)
+            self.prof.dump_stats(METRICS.with_name(f'profile-{self.name}.pstats'))
+        rec = {"span": self.name, "program": _program, "pid": os.getpid(), "start": round(time.time() - wall, 6),
+               "wall_s": round(wall, 6), "cpu_s": round(cpu, 6), "ok": exc[0] is None, **self.counters}
+        METRICS.parent.mkdir(parents=True, exist_ok=True)
+        with open(METRICS, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(rec, sort_keys=True) + '\n')
+        return False
+
+def span(name, **counters):
+    return Span(name, counters) if _on else NULL
+
+def enabled():
+    return _on
+
+def enable(pstats=None, program=None):
+    global _on, _pstats, _program
+    _on = True
+    if pstats: _pstats = pstats
+    if program: _program = program
+
+def add_arguments(ap):
+    ap.add_argument('--profile', action='store_true', help=f'record timed spans to build/metrics.jsonl (or set {PROFILE_ENV}=1)')
+    ap.add_argument('--pstats', metavar='SPAN', help='also dump cProfile stats for this span to build/profile-SPAN.pstats')
+
+def configure(args, program):
+    if args.profile or args.pstats: enable(args.pstats, program)
+    elif _on: enable(program=program)
@@ -0,0 +1,391 @@
+import argparse, hashlib, heapq, json, os, sqlite3, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .profiling import span
+ROOT = Path(__file__).resolve().parents[1]
+RECEIPTS = ROOT/'receipts'/'events.jsonl'
+EVENT_SCHEMA = ROOT/'schemas'/'event.schema.json'
+VALIDATE_CHUNK_BYTES = 8 << 20
+ACTIVE_MAX_LINES = 4096
+INDEX_VERSION = 4   # bump when the sidecar's tables change: old ones are rebuilt
+MAX_SEGMENTS = 8
+
+# Receipt log = compacted base (receipts/events.jsonl, sorted) + sealed sorted
+# segments + one unsorted active segment, all under receipts/segments/.
+# Appends touch only the active segment; readers merge everything into the
+# single sorted line order the pipeline has always seen. Compaction and reset
+# journal the segments they absorb in compact.pending, so a crash mid-way is
+# finished on the next open instead of duplicating or dropping events.
+#
+# events.idx.sqlite is a sidecar over the base file only: provider_id ->
+# (offset, length) of its lines, the same per observed_at day (so a day's
+# events can be read without scanning the log -- cli.digest verify-day), plus
+# the base's latest observed_at, a sha256 of its lines less score_run
+# receipts (for ReceiptReader.digest()) and one of all its lines (for
+# cli.digest, which only feeds the Merkle tree what came after). It is
+# rewritten whenever the base is (ingest, compaction) and rebuilt on read if
+# the base's stat key no longer matches. Segments are small and bounded by
+# ACTIVE_MAX_LINES * MAX_SEGMENTS, so lookups simply scan them.
+
+def _lines(path):
+    if not path.exists(): return []
+    return [l for l in path.read_text(encoding='utf-8').splitlines() if l.strip()]
+
+def _day(ts):
+    # observed_at -> 'YYYY-MM-DD'; '' when missing (such lines belong to every day range)
+    return ts.split('T')[0] if isinstance(ts, str) else ''
+
+def _stat_key(st):
+    # index key of a base file: any rewrite (os.replace) changes it
+    return json.dumps([INDEX_VERSION, st.st_size, st.st_mtime_ns, st.st_ino])
+
+def _with_offsets(raw_lines):
+    # (byte offset, raw line) for newline-terminated lines
+    off = 0
+    for raw in raw_lines:
+        yield off, raw
+        off += len(raw) + 1
+
+def _write_lines(path, lines):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(''.join(l + '\n' for l in lines), encoding='utf-8')
+    os.replace(tmp, path)
+
+class ReceiptLog:
+    def __init__(self, base=RECEIPTS):
+        self.base = Path(base)
+        self.dir = self.base.parent/'segments'
+        self.active = self.dir/'active.jsonl'
+        self.pending = self.dir/'compact.pending'
+        self.index = self.base.with_name(self.base.stem + '.idx.sqlite')
+        self._recover()
+
+    def sealed(self):
+        return sorted(self.dir.glob('seg-*.jsonl'))
+
+    def files(self):
+        return [p for p in [self.base, *self.sealed(), self.active] if p.exists()]
+
+    def lines(self):
+        runs = [_lines(self.base)] + [_lines(p) for p in self.sealed()] + [sorted(_lines(self.active))]
+        return heapq.merge(*runs)
+
+    def append(self, lines):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.active, 'a', encoding='utf-8') as f:
+            f.write(''.join(l + '\n' for l in lines))
+        if len(_lines(self.active)) >= ACTIVE_MAX_LINES: self.seal()
+        if len(self.sealed()) > MAX_SEGMENTS: self.compact()
+
+    def seal(self):
+        if not self.active.exists(): return
+        lines = sorted(_lines(self.active))
+        if not lines: self.active.unlink(); return
+        _write_lines(self.active, lines)
+        seq = max((int(p.stem.split('-')[1]) for p in self.sealed()), default=0) + 1
+        os.replace(self.active, self.dir/f'seg-{seq:06d}.jsonl')
+
+    def compact(self):
+        self.reset(self.lines(), sort=False)
+
+    def reset(self, lines, sort=True):
+        # replace the whole log with `lines`; compact() passes the merged view
+        self.seal()
+        absorbed = self.sealed()
+        with span('receipts.sort' if sort else 'receipts.merge') as s:
+            lines = sorted(lines) if sort else list(lines)
+            s.add(lines=len(lines))
+        with span('receipts.rewrite', segments=len(absorbed)) as s:
+            self.base.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.base.with_name(self.base.name + '.tmp')
+            tmp.write_text(''.join(l + '\n' for l in lines), encoding='utf-8')
+            s.add(bytes_written=tmp.stat().st_size)
+            if absorbed:
+                self.pending.write_text(absorbed[-1].name + '\n', encoding='utf-8')
+            os.replace(tmp, self.base)
+            self._finish()
+        with span('receipts.index', lines=len(lines)):
+            self._write_index(_with_offsets(l.encode('utf-8') for l in lines))
+
+    def _finish(self):
+        last = self.pending.read_text(encoding='utf-8').strip() if self.pending.exists() else ''
+        for p in self.sealed():
+            if p.name <= last: p.unlink()
+        if self.pending.exists(): self.pending.unlink()
+
+    def _recover(self):
+        tmp = self.base.with_name(self.base.name + '.tmp')
+        if self.pending.exists():
+            if tmp.exists(): os.replace(tmp, self.base)
+            self._finish()
+        elif tmp.exists():
+            tmp.unlink()
+
+    # -- provider index -------------------------------------------------------
+    def _base_key(self):
+        return _stat_key(self.base.stat())
+
+    def _write_index(self, entries, key=None):
+        refs, days, latest, h, whole = [], [], None, hashlib.sha256(), hashlib.sha256()
+        for off, raw in entries:
+            if not raw.strip(): continue
+            evt = json.loads(raw); pid = evt.get('provider_id'); ts = evt.get('observed_at')
+            if pid: refs.append((pid, off, len(raw)))
+            whole.update(raw + b'\n')
+            if evt.get('kind') != 'score_run': h.update(raw + b'\n')
+            days.append((_day(ts), off, len(raw)))
+            if ts: latest = max(latest, ts) if latest else ts
+        tmp = self.index.with_name(self.index.name + '.tmp')
+        if tmp.exists(): tmp.unlink()
+        db = sqlite3.connect(str(tmp))
+        db.execute('CREATE TABLE ref (provider_id TEXT, offset INTEGER, length INTEGER)')
+        db.execute('CREATE TABLE day (day TEXT, offset INTEGER, length INTEGER)')
+        db.execute('CREATE TABLE meta (k TEXT PRIMARY KEY, v TEXT)')
+        db.executemany('INSERT INTO ref VALUES (?,?,?)', refs)
+        db.execute('CREATE INDEX ref_pid ON ref (provider_id, offset)')
+        db.executemany('INSERT INTO day VALUES (?,?,?)', days)
+        db.execute('CREATE INDEX day_day ON day (day, offset)')
+        db.executemany('INSERT INTO meta VALUES (?,?)', [('base', key or self._base_key()), ('latest_observed_at', latest), ('digest', h.hexdigest()),
+                                                     ('lines_digest', whole.hexdigest())])
+        db.commit(); db.close()
+        os.replace(tmp, self.index)
+
+    def _open_base(self):
+        # -> (base file, index over exactly that file); (None, None) without a
+        # base. Readers read through the returned fd only, so a reset or
+        # compaction replacing the path never puts new bytes under old offsets
+        while True:
+            try: f = open(self.base, 'rb')
+            except FileNotFoundError: return None, None
+            key = _stat_key(os.fstat(f.fileno()))
+            try: current = self._base_key()
+            except FileNotFoundError: current = None
+            if key == current: return f, self._open_index(f, key)
+            f.close()   # replaced between open and stat: take the new file
+
+    def _open_index(self, f, key):
+        if self.index.exists():
+            db = sqlite3.connect(str(self.index), check_same_thread=False)
+            row = db.execute("SELECT v FROM meta WHERE k='base'").fetchone()
+            if row and row[0] == key: return db
+            db.close()
+        self._write_index(_with_offsets(os.pread(f.fileno(), os.fstat(f.fileno()).st_size, 0).split(b'\n')), key)
+        return sqlite3.connect(str(self.index), check_same_thread=False)
+
+    def stamp(self):
+        # changes whenever any file of the log does; cheap enough to poll
+        return tuple((p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in self.files())
+
+    def reader(self):
+        return ReceiptReader(self)
+
+    def latest_observed(self):
+        r = self.reader()
+        try: return r.latest_observed()
+        finally: r.close()
+
+    def receipts_for(self, provider_ids):
+        r = self.reader()
+        try: return r.receipts_for(provider_ids)
+        finally: r.close()
+
+class ReceiptReader:
+    # Point-in-time view: base fd, its index connection and the decoded segment
+    # tail held open, so a long-lived process pays for them once, not per
+    # lookup, and keeps reading the base it opened after the path is replaced.
+    # Decoded receipts are memoised per provider for the life of the reader.
+    def __init__(self, log):
+        self.base = log.base
+        self.f, self.db = log._open_base()
+        self.tail = [(line, json.loads(line)) for p in [*log.sealed(), log.active] for line in _lines(p)]
+        self._memo = {}
+
+    def close(self):
+        if self.db is not None: self.db.close(); self.db = None
+        if self.f is not None: self.f.close(); self.f = None
+
+    def _read(self, off, n):
+        return os.pread(self.f.fileno(), n, off).decode('utf-8')
+
+    def latest_observed(self):
+        latest = None
+        if self.db is not None:
+            latest = self.db.execute("SELECT v FROM meta WHERE k='latest_observed_at'").fetchone()[0]
+        for _, evt in self.tail:
+            ts = evt.get('observed_at')
+            if ts: latest = max(latest, ts) if latest else ts
+        return latest
+
+    def receipts_for(self, provider_ids):
+        wanted = set(p for p in provider_ids if p)
+        todo = wanted - self._memo.keys()
+        if todo: self._memo.update(self._lookup(todo))
+        return {p: self._memo[p] for p in wanted if self._memo[p]}
+
+    def _lookup(self, wanted):
+        # {provider_id: [event, ...]} in log order, decoding only those lines
+        found = {p: [] for p in wanted}
+        if self.db is not None and wanted:
+            for pid in sorted(wanted):
+                for off, n in self.db.execute('SELECT offset, length FROM ref WHERE provider_id=? ORDER BY offset', (pid,)):
+                    found[pid].append(self._read(off, n))
+        for line, evt in self.tail:
+            if evt.get('provider_id') in wanted: found[evt['provider_id']].append(line)
+        return {pid: [json.loads(l) for l in sorted(lines)] for pid, lines in found.items()}
+
+    def lines(self):
+        # the merged sorted log as of this reader
+        base = [] if self.f is None else [l for l in self._read(0, os.fstat(self.f.fileno()).st_size).splitlines() if l.strip()]
+        return heapq.merge(base, sorted(line for line, _ in self.tail))
+
+    def base_digest(self):
+        # sha256 over the base's lines, newline-terminated (cli.digest.lines_digest); None without a base
+        return self.db.execute("SELECT v FROM meta WHERE k='lines_digest'").fetchone()[0] if self.db is not None else None
+
+    def digest(self):
+        return _digest(self.db.execute("SELECT v FROM meta WHERE k='digest'").fetchone()[0] if self.db is not None else None,
+                       self.tail, self.latest_observed())
+
+    def lines_between(self, since, until):
+        # sorted lines observed after day `since` (None: from the start) up to
+        # and including day `until`: seeks to the base's lines through the day
+        # index, scans only the (bounded) segments
+        in_range = lambda d: d == '' or ((since is None or d > since) and d <= until)
+        base = []
+        if self.db is not None:
+            for off, n in self.db.execute("SELECT offset, length FROM day WHERE day = '' OR (day > ? AND day <= ?) ORDER BY offset",
+                                          (since or '', until)):
+                base.append(self._read(off, n))
+        return list(heapq.merge(base, sorted(line for line, evt in self.tail if in_range(_day(evt.get('observed_at'))))))
+
+def _digest(base_digest, tail, latest_observed):
+    # everything a ranking reads from the log, kept up to date as it changes:
+    # the index's base digest, the (bounded) segment lines and the latest
+    # observed_at. score_run receipts are left out (rankings never read them),
+    # so a run's own receipt does not change the next run's digest
+    seg = sorted(line for line, evt in tail if evt.get('kind') != 'score_run')
+    return hashlib.sha256(json.dumps([base_digest, seg, latest_observed]).encode('utf-8')).hexdigest()
+
+class MemoryReader:
+    # ReceiptReader over lines a caller already holds (sorted) with their
+    # parsed events, e.g. the pipeline between ingest and digest
+    def __init__(self, lines, events):
+        self.lines, self.events = lines, events
+
+    def close(self):
+        pass
+
+    def latest_observed(self):
+        return max((e.get('observed_at') for e in self.events if e.get('observed_at')), default=None)
+
+    def digest(self):
+        # as ReceiptReader.digest() of this log compacted into the base
+        h = hashlib.sha256()
+        for line, evt in zip(self.lines, self.events):
+            if evt.get('kind') != 'score_run': h.update((line + '\n').encode('utf-8'))
+        return _digest(h.hexdigest(), [], self.latest_observed())
+
+    def receipts_for(self, provider_ids):
+        wanted = set(p for p in provider_ids if p)
+        found = {}
+        for evt in self.events:
+            if evt.get('provider_id') in wanted: found.setdefault(evt['provider_id'], []).append(evt)
+        return found
+
+def read_lines(base=RECEIPTS):
+    return list(ReceiptLog(base).lines())
+
+# -- validation ---------------------------------------------------------------
+# Every file of the log is cut into ~VALIDATE_CHUNK_BYTES ranges on line
+# boundaries and checked by worker processes, each holding one compiled
+# validator. Base and sealed segments must be sorted; identical lines within a
+# file are duplicates, except score_run receipts, which every re-run of an
+# unchanged ranking appends again. The active segment may be in any order.
+# Workers report chunk-local line numbers plus their first and last line, so
+# the parent can number errors and check the seams between chunks.
+
+_validator = None
+
+def _init_validator(schema_path):
+    global _validator
+    from jsonschema import Draft202012Validator
+    _validator = Draft202012Validator(json.loads(Path(schema_path).read_text(encoding='utf-8')))
+
+def _line_errors(raw):
+    try: evt = json.loads(raw)
+    except ValueError as e: return None, [f'invalid JSON: {e}']
+    if _validator.is_valid(evt): return evt, []
+    from jsonschema.exceptions import best_match
+    err = best_match(_validator.iter_errors(evt))
+    return evt, [f'schema: {"/".join(map(str, err.absolute_path)) or "<event>"}: {err.message}']
+
+def _is_dup(line, prev):
+    return line == prev and not line.startswith('{"kind":"score_run"')
+
+def _check_range(path, start, end, ordered, max_errors):
+    # -> (lines, first_line_no, first, last, [(line_no_in_chunk, message)], error_count)
+    with open(path, 'rb') as f:
+        f.seek(start); buf = f.read(end - start)
+    errors, count, first, first_no, prev, seen = [], 0, None, None, None, set()
+    raws = buf.split(b'\n')
+    if raws and raws[-1] == b'': raws.pop()
+    for n, raw in enumerate(raws, 1):
+        if not raw.strip(): continue
+        line = raw.decode('utf-8', 'replace')
+        msgs = _line_errors(raw)[1]
+        if ordered:
+            if prev is not None and line < prev: msgs.append('out of order')
+            if _is_dup(line, prev): msgs.append('duplicate of the previous line')
+        elif line in seen and _is_dup(line, line): msgs.append('duplicate line')
+        else: seen.add(line)
+        if first is None: first, first_no = line, n
+        prev = line; count += len(msgs)
+        errors += [(n, m) for m in msgs][:max(0, max_errors - len(errors))]
+    return len(raws), first_no, first, prev, errors, count
+
+def _ranges(path, chunk_bytes):
+    size = path.stat().st_size; cuts = [0]
+    with open(path, 'rb') as f:
+        for off in range(chunk_bytes, size, chunk_bytes):
+            if off <= cuts[-1]: continue
+            f.seek(off); f.readline(); cuts.append(f.tell())
+    if cuts[-1] < size: cuts.append(size)
+    return list(zip(cuts, cuts[1:]))
+
+def validate(log=None, max_errors=20, workers=None, schema_path=EVENT_SCHEMA, chunk_bytes=VALIDATE_CHUNK_BYTES):
+    # -> {"files", "lines", "error_count", "errors": [first max_errors "file:line: message"]}
+    log = log or ReceiptLog()
+    tasks = [(p, lo, hi, p != log.active) for p in log.files() for lo, hi in _ranges(p, chunk_bytes)]
+    args = [(str(p), lo, hi, ordered, max_errors) for p, lo, hi, ordered in tasks]
+    if len(tasks) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_validator, initargs=(str(schema_path),)) as pool:
+            results = list(pool.map(_check_range, *zip(*args)))
+    else:
+        _init_validator(schema_path); results = [_check_range(*a) for a in args]
+    errors, count, lines, done = [], 0, {}, {}
+    for (path, lo, hi, ordered), (n, first_no, first, last, errs, c) in zip(tasks, results):
+        name = str(path.relative_to(ROOT) if path.is_relative_to(ROOT) else path)
+        base_no = lines.get(path, 0); prev = done.get(path)
+        if ordered and first is not None and prev is not None:
+            seam = (['out of order'] if first < prev else []) + (['duplicate of the previous line'] if _is_dup(first, prev) else [])
+            errs = [(first_no, m) for m in seam] + errs; c += len(seam)
+        errors += [(name, base_no + i, m) for i, m in errs]; count += c
+        lines[path] = base_no + n
+        if last is not None: done[path] = last
+    return {"files": len(lines), "lines": sum(lines.values()), "error_count": count,
+            "errors": [f'{f}:{i}: {m}' for f, i, m in errors[:max_errors]]}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.receipts')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('compact', help='fold sealed segments and the active segment into the base')
+    v = sub.add_parser('validate', help='schema-, order- and duplicate-check the whole log')
+    v.add_argument('--max-errors', type=int, default=20)
+    v.add_argument('--workers', type=int, help='validator processes (default: one per CPU)')
+    a = ap.parse_args(argv)
+    if a.cmd == 'compact': ReceiptLog().compact(); return
+    report = validate(max_errors=a.max_errors, workers=a.workers)
+    for e in report["errors"]: print(e)
+    print(f'{report["lines"]} lines in {report["files"]} file(s): {report["error_count"]} error(s)')
+    if report["error_count"]: sys.exit(1)
+if __name__ == '__main__': main()
@@ -0,0 +1,171 @@
+import argparse, mmap, os, time
+from pathlib import Path
+import numpy as np
+from .common import read_json, sha256_file
+from .columnar import Columns
+from .ingest import RACY_NS
+from .extract import OVERLAY
+ROOT = Path(__file__).resolve().parents[1]
+REGISTRY = ROOT/'registry'/'providers.json'
+SCHEMA = ROOT/'schemas'/'providers.schema.json'
+COMPILED = ROOT/'build'/'registry.bin'
+
+# Compiled registry: the scoring columns of providers.json, validated once and
+# laid out for mmap. Little-endian, every section 8-byte aligned:
+#   header   b'FBRG0003' | sha256 of the source JSON (32) | sha256 of the
+#            extracted overlay (32; zeros if none) | source stat key
+#            (size, mtime_ns, ino; zeros if the file was too fresh to trust)
+#            | u64 rows | u64 tag words | u64 tags | u64 strings | u64 blob bytes
+#            | u64 postings
+#   columns  FLOATS x rows f8 (NaN = missing; price = effective price)
+#   refs     rows x i8 (provider_id) | tags x i8 (tag names, in bit order)
+#   strings  (strings + 1) x i8 offsets into the blob | tag bits rows x words u8
+#   tags     (tags + 1) x i8 posting starts | postings x i8 rows (tag -> rows)
+#   blob     interned UTF-8 strings
+# Opening costs a header read: arrays are views into the mapping and provider
+# ids are decoded only when asked for. Fields extracted from the corpus
+# (cli.extract) are merged into providers with matching ids before compiling.
+
+MAGIC = b'FBRG0003'
+HEADER = 8 + 32 + 32 + 3 * 8 + 6 * 8
+FLOATS = ('lat', 'lng', 'price_per_day', 'rad', 'mpir', 'star_overall', 'price')
+
+class StringColumn:
+    # read-only sequence of interned strings: refs into (offsets, blob).
+    # source: (path, content key) of the compiled registry the blob maps; a
+    # pickled column carries that and its refs, never the mapping, and is
+    # reattached to the file in the receiving process (see _reopen)
+    def __init__(self, refs, offsets, blob, source=None):
+        self.refs, self.offsets, self.blob, self.source = refs, offsets, blob, source
+
+    def __reduce__(self):
+        if self.source is None: return list, (list(self),)
+        return _reopen, (*self.source, np.array(self.refs))
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return StringColumn(self.refs[i], self.offsets, self.blob, self.source)
+        s = int(self.refs[i])
+        return bytes(self.blob[self.offsets[s]:self.offsets[s + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+_OPENED = {}   # path -> CompiledRegistry, per process (pool workers unpickling provider ids)
+
+def _reopen(path, key, refs):
+    reg = _OPENED.get(path)
+    if reg is None or reg.key != key:
+        reg = _OPENED[path] = CompiledRegistry(path)
+        if reg.key != key: raise ValueError(f'{path} was recompiled from different inputs while being scored')
+    return StringColumn(refs, reg.string_offsets, reg.blob, (str(path), key))
+
+def validate(providers, schema_path=SCHEMA):
+    from jsonschema import Draft202012Validator
+    errors = sorted(Draft202012Validator(read_json(schema_path)).iter_errors(providers), key=lambda e: list(e.absolute_path))
+    if errors:
+        shown = '; '.join(f'{"/".join(map(str, e.absolute_path)) or "<root>"}: {e.message}' for e in errors[:5])
+        raise ValueError(f'{len(errors)} schema error(s) in registry: {shown}')
+
+def _stat_key(path, started_ns):
+    st = path.stat()
+    return (st.st_size, st.st_mtime_ns, st.st_ino) if st.st_mtime_ns < started_ns - RACY_NS else (0, 0, 0)
+
+def _overlay_sha(overlay):
+    return sha256_file(overlay) if overlay is not None and overlay.exists() else '00' * 32
+
+def merge_overlay(providers, overlay):
+    by_id = read_json(overlay) if overlay is not None and overlay.exists() else {}
+    for p in providers if isinstance(providers, list) else []:
+        o = by_id.get(p.get('provider_id')) if isinstance(p, dict) else None
+        if o: p.update(o['fields'])
+    return providers
+
+def build(src=REGISTRY, out=COMPILED, schema_path=SCHEMA, overlay=OVERLAY):
+    started_ns = time.time_ns(); key = _stat_key(src, started_ns); sha = sha256_file(src); overlay_sha = _overlay_sha(overlay)
+    providers = merge_overlay(read_json(src), overlay)
+    validate(providers, schema_path)
+    cols = Columns.from_providers(providers)
+    strings, interned = [], {}
+    def intern(s):
+        if s not in interned: interned[s] = len(strings); strings.append(s)
+        return interned[s]
+    id_refs = np.array([intern(p) for p in cols.provider_ids], dtype='<i8')
+    tag_refs = np.array([intern(t) for t in sorted(cols.tag_vocab, key=cols.tag_vocab.get)], dtype='<i8')
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8'); offsets[1:] = np.cumsum([len(b) for b in encoded])
+    words = cols.tag_bits.shape[1]
+    starts, rows = cols.tag_postings
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + bytes.fromhex(sha) + bytes.fromhex(overlay_sha))
+        f.write(np.array([*key, len(cols), words, len(tag_refs), len(strings), int(offsets[-1]), len(rows)], dtype='<u8').tobytes())
+        for name in FLOATS: f.write(np.ascontiguousarray(getattr(cols, name), dtype='<f8').tobytes())
+        f.write(id_refs.tobytes()); f.write(tag_refs.tobytes()); f.write(offsets.tobytes())
+        f.write(np.ascontiguousarray(cols.tag_bits, dtype='<u8').tobytes())
+        f.write(starts.astype('<i8').tobytes()); f.write(rows.astype('<i8').tobytes())
+        f.write(b''.join(encoded))
+    os.replace(tmp, out)
+    return len(cols)
+
+class CompiledRegistry:
+    def __init__(self, path=COMPILED):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC: raise ValueError(f'{path} is not a compiled registry')
+        self.source_sha256 = self._mm[8:40].hex()
+        self.overlay_sha256 = self._mm[40:72].hex()
+        self.key = self._mm[8:72].hex()   # source + overlay sha256: equal keys, equal strings and offsets
+        head = np.frombuffer(self._mm, dtype='<u8', count=9, offset=72)
+        self.source_stat = tuple(int(v) for v in head[:3])
+        n, words, n_tags, n_strings, blob, n_postings = (int(v) for v in head[3:])
+        pos = HEADER
+        def take(dtype, count, shape=None):
+            nonlocal pos
+            a = np.frombuffer(self._mm, dtype=dtype, count=count, offset=pos); pos += a.nbytes
+            return a if shape is None else a.reshape(shape)
+        self.floats = {name: take('<f8', n) for name in FLOATS}
+        id_refs, tag_refs, offsets = take('<i8', n), take('<i8', n_tags), take('<i8', n_strings + 1)
+        self.tag_bits = take('<u8', n * words, (n, words))
+        self.tag_postings = take('<i8', n_tags + 1), take('<i8', n_postings)
+        self.string_offsets, self.blob = offsets, memoryview(self._mm)[pos:pos + blob]
+        self.provider_ids = StringColumn(id_refs, offsets, self.blob, (str(path), self.key))
+        self.tag_vocab = {t: i for i, t in enumerate(StringColumn(tag_refs, offsets, self.blob))}
+
+    def __len__(self):
+        return len(self.provider_ids)
+
+    def columns(self):
+        f = self.floats
+        return Columns(provider_ids=self.provider_ids, lat=f['lat'], lng=f['lng'],
+                       price_per_day=f['price_per_day'], rad=f['rad'], mpir=f['mpir'], star_overall=f['star_overall'],
+                       tag_bits=self.tag_bits, tag_vocab=self.tag_vocab, price=f['price'], tag_postings=self.tag_postings)
+
+def load(src=REGISTRY, path=COMPILED, schema_path=SCHEMA, overlay=OVERLAY):
+    # compile on first use and whenever the source or overlay changes; an
+    # unchanged stat key skips re-hashing the JSON, anything else is settled by
+    # its sha256 (the overlay is small and always hashed)
+    try:
+        reg = CompiledRegistry(path)
+        st = src.stat()
+        if ((reg.source_stat == (st.st_size, st.st_mtime_ns, st.st_ino) or reg.source_sha256 == sha256_file(src))
+                and reg.overlay_sha256 == _overlay_sha(overlay)):
+            return reg
+    except (OSError, ValueError):
+        pass
+    build(src, path, schema_path, overlay)
+    return CompiledRegistry(path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.registry')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    c = sub.add_parser('compile', help='validate providers.json and write the mmap-able columnar registry')
+    c.add_argument('--src', type=Path, default=REGISTRY)
+    c.add_argument('--out', type=Path, default=COMPILED)
+    c.add_argument('--overlay', type=Path, default=OVERLAY, help='extracted fields to merge (default: cli.extract output)')
+    a = ap.parse_args(argv)
+    print(f'{build(a.src, a.out, overlay=a.overlay)} providers -> {a.out}')
+if __name__ == '__main__': main()
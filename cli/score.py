@@ -1,128 +1,252 @@
-import json
+import argparse, hashlib, json
 from pathlib import Path
-from .common import write_json, read_json, haversine_km, sha256_file
-from .fee_math import dap_from_rad
+import numpy as np
+from .common import write_json, read_json, sha256_file, json_bytes
+from .columnar import (best, best_parallel, item, haversine_km, components, reweight, fit_score, quality_component,
+                       COMPONENTS, NEEDS_MATCH)
+from . import spatial, postcodes, registry, cache
+from .receipts import ReceiptLog, MemoryReader
+from .profiling import span, add_arguments, configure
 
 ROOT = Path(__file__).resolve().parents[1]
 RECEIPTS = ROOT / "receipts" / "events.jsonl"
 RANKINGS = ROOT / "rankings" / "top5.json"
-
-def clamp01(x): 
-    return max(0.0, min(1.0, x))
-
-def main():
-    # Load inputs
-    providers = read_json(ROOT / "registry" / "providers.json")
-    weights   = read_json(ROOT / "config" / "presets" / "balanced.json")
-    query     = read_json(ROOT / "config" / "query_canned.json")
-
-    # Receipts map + latest observed
-    receipts_by_provider = {}
-    latest_obs = None
-    if RECEIPTS.exists():
-        lines = [l for l in RECEIPTS.read_text(encoding="utf-8").splitlines() if l.strip()]
-        for line in lines:
-            evt = json.loads(line)
-            pid = evt.get("provider_id")
-            if pid:
-                receipts_by_provider.setdefault(pid, []).append(evt)
-            ts = evt.get("observed_at")
-            if ts:
-                latest_obs = max(latest_obs, ts) if latest_obs else ts
-
-    # Origin (Phase-1: postcode 2000 → CBD)
-    origin = {"lat": -33.8688, "lng": 151.2093}
+REGISTRY = ROOT / "registry" / "providers.json"
+PRESETS = ROOT / "config" / "presets"
+QUERY = ROOT / "config" / "query_canned.json"
+BATCH_OUT = ROOT / "rankings" / "batch"
+MATRIX = ROOT / "rankings" / "matrix.json"
+SPATIAL_INDEX = ROOT / "build" / "spatial.npz"
+MARGIN_KM = 10.0
+
+class Registry:
+    # scoring columns + spatial index + postcode table, loaded once per process (or reload);
+    # sha256: content hash of all three inputs (None: not cacheable)
+    def __init__(self, cols, index, postcodes, sha256=None):
+        self.cols, self.index, self.postcodes, self.sha256 = cols, index, postcodes, sha256
+        self._quality_max = None
+
+    def quality_max(self):
+        if self._quality_max is None:
+            self._quality_max = float(quality_component(self.cols.star_overall).max(initial=0.0))
+        return self._quality_max
+
+    @classmethod
+    def load(cls):
+        with span('score.load_registry') as s:
+            compiled = registry.load(REGISTRY); cols = compiled.columns(); s.add(providers=len(cols))
+        with span('score.load_indexes'):
+            table = postcodes.load()
+            sha = hashlib.sha256(f'{compiled.source_sha256}:{compiled.overlay_sha256}:{table.source_sha256}'.encode()).hexdigest()
+            return cls(cols, spatial.load_or_build(SPATIAL_INDEX, cols, compiled.source_sha256), table, sha)
+
+def preset_label(name):
+    return name.replace("_", " ").title()
+
+def needs_params(query):
+    # -> (needs, must_have, needs_match). must_have: tags every ranked provider
+    # carries (hard filter); needs_match: "any" (default) or "overlap" (graded)
+    match = query.get("needs_match", "any")
+    if match not in NEEDS_MATCH: raise ValueError(f'needs_match must be one of {", ".join(NEEDS_MATCH)}')
+    return set(query.get("needs", [])), set(query.get("must_have", [])), match
+
+def rank(registry, query, weights, preset, receipts, k=5, workers=1):
+    # receipts: anything with latest_observed() / receipts_for() (ReceiptLog, ReceiptReader)
+    latest_obs = receipts.latest_observed()
+    cols, pool, origin, radius_km, budget, needs, needs_match = candidates(registry, query)
+    params = (origin, radius_km, budget, needs, weights, needs_match)
+    top_k = lambda cols: best_parallel(cols, params, k, workers) if workers > 1 else best(cols, params, k)
+    with span('score.top_k', rows=len(cols), k=k, workers=workers):
+        hits = top_k(cols)
+    if pool is not None and not settled(hits, k, reach_bound(registry, query, weights)):
+        with span('score.top_k_all', rows=len(pool), k=k, workers=workers):
+            hits = top_k(pool)
+    return output(registry.cols.provider_ids, query, preset, latest_obs, hits, receipts, k)
+
+def candidates(registry, query):
+    # -> (candidate columns, pool, origin, radius_km, budget, needs, needs_match);
+    # pool: the columns to rank instead when the candidates don't settle the
+    # top k (None: the candidates already are the pool)
+    # Origin: postcode centroid (ValueError if the table doesn't know it)
+    origin = registry.postcodes.origin(query.get("postcode"))
     radius_km = float(query.get("radius_km", 20.0))
     budget    = float(query.get("budget_per_day", 100.0))
-    needs     = set(query.get("needs", []))
-
-    scored = []
-    for p in providers if isinstance(providers, list) else []:
-        lat, lng = p.get("lat"), p.get("lng")
-        if lat is None or lng is None:
-            loc = 0.0
-        else:
-            d_km = haversine_km(origin["lat"], origin["lng"], float(lat), float(lng))
-            loc = 1.0 - clamp01(d_km / max(radius_km, 0.1))
-
-        # PRICE: explicit price → score; else compute from RAD/MPIR; else neutral 0.5
-        price_pd = p.get("price_per_day")
-        if price_pd is None and (p.get("rad") is not None and p.get("mpir") is not None):
-            try:
-                price_pd = dap_from_rad(p["rad"], p["mpir"])
-            except Exception:
-                price_pd = None
-        if price_pd is None:
-            price = 0.5
+    needs, must_have, needs_match = needs_params(query)
+    margin_km = float(query.get("margin_km", MARGIN_KM))
+
+    # Candidates: providers within radius + margin out of the pool, the whole
+    # registry or, for must_have, the providers carrying every listed tag
+    # (straight from the inverted index, so the spatial pass only sees those).
+    # A provider out of reach still scores on price, quality and needs, so the
+    # candidates stand in for the pool only while their k-th best fit beats
+    # anything an out-of-reach provider could reach (see settled()).
+    cols = registry.cols
+    with span('score.candidates') as s:
+        if must_have:
+            rows = cols.rows_with(must_have)
+            with np.errstate(invalid='ignore'):
+                near = rows[haversine_km(origin["lat"], origin["lng"], cols.lat[rows], cols.lng[rows]) <= radius_km + margin_km]
+            pool = cols.take(rows)
         else:
-            price = 1.0 if price_pd <= budget else clamp01(1.0 - ((price_pd - budget) / max(budget, 1.0)))
-
-        # QUALITY: neutral 0.5 when missing
-        s_over = p.get("star_overall")
-        qual   = 0.5 if s_over is None else clamp01(float(s_over) / 5.0)
-
-        # NEEDS: 1 if any tag matches; else 0.0
-        tags = p.get("tags") or []
-        need_hit = 1.0 if any(tag in needs for tag in tags) else 0.0
-
-        fit = (
-            weights["w_location"] * loc +
-            weights["w_price"]    * price +
-            weights["w_quality"]  * qual +
-            weights["w_needs"]    * need_hit
-        )
-
-        scored.append({
-            "provider_id": p.get("provider_id", "unknown"),
-            "fit_score": round(fit, 6),
-            "components": {
-                "location": round(loc,   6),
-                "price":    round(price, 6),
-                "quality":  round(qual,  6),
-                "needs":    round(need_hit, 6),
-            },
-            "receipts": receipts_by_provider.get(p.get("provider_id", ""), [])
-        })
+            near = registry.index.within(cols, origin, radius_km + margin_km); pool = cols
+        if len(near) and len(near) < len(pool): cols = cols.take(near)
+        else: cols, pool = pool, None
+        s.add(rows=len(cols))
+    return cols, pool, origin, radius_km, budget, needs, needs_match
+
+def reach_bound(registry, query, weights):
+    # highest fit any provider beyond radius + margin can score: location can
+    # not exceed 1 - reach/radius (0 once reach >= radius), price 1, quality the
+    # registry's best, needs the share of requested needs any provider has.
+    # None: no usable bound (negative weights)
+    if any(weights[w] < 0 for w in ("w_location", "w_price", "w_quality", "w_needs")): return None
+    radius_km = float(query.get("radius_km", 20.0))
+    reach = radius_km + float(query.get("margin_km", MARGIN_KM))
+    needs, _, needs_match = needs_params(query)
+    known = sum(t in registry.cols.tag_vocab for t in needs)
+    need_max = (known / len(needs) if needs_match == "overlap" else float(known > 0)) if needs else 0.0
+    loc_max = 1.0 - min(1.0, max(reach, 0.0) / max(radius_km, 0.1))
+    return fit_score(weights, loc_max, 1.0, registry.quality_max(), need_max)
+
+def settled(hits, k, bound):
+    # True when no provider scoring at most `bound` can enter or reorder these
+    # top-k hits (their rounded fits stay strictly above it, ties included)
+    return bound is not None and len(hits) == k and -hits[-1][0][0] > bound + 1e-6
+
+# Component matrix: the four weight-independent components of every provider
+# a query can rank (the candidates' whole pool), as columnar JSON (floats are written round-trip exact). Any
+# weight vector re-ranks it with a dot product and a top-k, no registry or
+# receipt log needed: rerank() here, the weight sliders in web/index.html.
+#   {"query", "generated_at", "preset", "weights", "provider_ids": [...],
+#    "location": [...], "price": [...], "quality": [...], "needs": [...]}
+# preset/weights are the defaults the matrix was requested with.
+
+def matrix(registry, query, weights, preset, receipts):
+    cols, pool, *params = candidates(registry, query)
+    cols = cols if pool is None else pool   # any weights may need providers out of reach
+    with span('score.matrix', rows=len(cols)):
+        comps = components(cols, *params)
+        out = {name: comps[name].tolist() for name in COMPONENTS if name != "fit"}
+    return {"query": query, "generated_at": receipts.latest_observed() or "2025-09-08T00:00:00Z",
+            "preset": preset, "weights": weights, "provider_ids": list(cols.provider_ids), **out}
+
+def rerank(matrix, weights, preset=None, receipts=None, k=5):
+    # the ranking rank() gives for the matrix's query under these weights;
+    # byte-identical to it when receipts is the reader the matrix was built with
+    comps = {name: np.array(matrix[name], dtype=np.float64) for name in COMPONENTS if name != "fit"}
+    hits = reweight(matrix["provider_ids"], comps, weights, k)
+    return output([], matrix["query"], preset or matrix["preset"], matrix["generated_at"], hits, receipts or MemoryReader([], []), k)
+
+def output(fallback_ids, query, preset, latest_obs, hits, receipts, k):
+    with span('score.receipts', providers=len(hits)):
+        receipts_by_provider = receipts.receipts_for([key[1] for key, _, _ in hits])
+    items = [item(key[1], values, receipts_by_provider.get(key[1], [])) for key, _, values in hits]
 
     # Hard fallback: if nothing scored (unexpected), fabricate neutral Top-5
-    if not scored:
-        base = providers if isinstance(providers, list) else []
-        for rp in base[:5]:
-            scored.append({
-                "provider_id": rp.get("provider_id", "unknown"),
+    # from fallback_ids (the registry's); never for must_have, where no match
+    # is a legitimate answer
+    if not items and not query.get("must_have"):
+        for pid in fallback_ids[:k]:
+            items.append({
+                "provider_id": pid,
                 "fit_score": 0.5,
                 "components": {"location": 0.5, "price": 0.5, "quality": 0.5, "needs": 0.0},
                 "receipts": []
             })
 
-    scored.sort(key=lambda x: (-x["fit_score"], x["provider_id"]))
-    items = scored[:5]
-
-    out = {
+    return {
         "query": query,
-        "preset": "Balanced",
+        "preset": preset,
         "generated_at": latest_obs or "2025-09-08T00:00:00Z",
         "items": items
     }
-    write_json(RANKINGS, out)
 
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m cli.score")
+    ap.add_argument("--top-k", type=int, default=5, help="number of ranked items (default 5)")
+    ap.add_argument("--workers", type=int, default=1, help="score registry shards in this many processes")
+    ap.add_argument("--out", type=Path, default=RANKINGS)
+    ap.add_argument("--batch", type=Path, metavar="QUERIES.jsonl", help="score every query in this file instead of the canned one")
+    ap.add_argument("--presets", type=Path, default=PRESETS, help="preset directory for --batch (every *.json)")
+    ap.add_argument("--batch-out", type=Path, default=BATCH_OUT, help="output directory for --batch")
+    ap.add_argument("--no-cache", action="store_true", help="always rescore; don't read or fill the ranking cache")
+    ap.add_argument("--matrix", type=Path, nargs="?", const=MATRIX, metavar="PATH",
+                    help="write the canned query's component matrix instead (default rankings/matrix.json)")
+    add_arguments(ap)
+    args = ap.parse_args(argv)
+    configure(args, "score")
+    with span("score"):
+        if args.batch:
+            return main_batch(args)
+        if args.matrix:
+            return write_matrix(args.matrix)
+
+        run(args.out, k=args.top_k, workers=args.workers, ranking_cache=None if args.no_cache else cache.RankingCache())
+
+def run(out_path=RANKINGS, k=5, workers=1, receipts=None, ranking_cache=None):
+    # canned query x balanced preset -> out_path, plus its score_run receipt;
+    # receipts: a reader to rank against (default: one over the log);
+    # ranking_cache: a cache.RankingCache to answer from when inputs are unchanged
+    # -> (ranking, appended receipt line)
+    registry = Registry.load()
+    weights  = read_json(PRESETS / "balanced.json")
+    query    = read_json(QUERY)
+
+    log = ReceiptLog(RECEIPTS)
+    reader = receipts or log.reader()
+    try:
+        compute = lambda: json_bytes(rank(registry, query, weights, preset_label("balanced"), reader, k=k, workers=workers))
+        if ranking_cache is None: body = compute()
+        else:
+            with span("score.cache") as s:
+                before = ranking_cache.counters()
+                ck = cache.key(query, preset_label("balanced"), weights, k, registry.sha256, reader.digest()) if registry.sha256 else None
+                body = ranking_cache.get_or_put(ck, compute)
+                s.add(**{c: n - before[c] for c, n in ranking_cache.counters().items()})
+    finally:
+        if reader is not receipts: reader.close()
+    with span("score.write") as s:
+        out_path.parent.mkdir(parents=True, exist_ok=True); out_path.write_bytes(body); s.add(bytes_written=len(body))
+
+    out = json.loads(body)
+    return out, append_score_run(log, out_path, out["generated_at"])
+
+def write_matrix(out_path=MATRIX):
+    # read-only: no score_run receipt, the matrix is not a ranking
+    log = ReceiptLog(RECEIPTS)
+    out = matrix(Registry.load(), read_json(QUERY), read_json(PRESETS / "balanced.json"), preset_label("balanced"), log)
+    with span("score.write") as s:
+        write_json(out_path, out); s.add(bytes_written=out_path.stat().st_size)
+    return out
+
+def main_batch(args):
+    from .batch import load_queries, run
+    registry = Registry.load()
+    presets  = {p.stem: read_json(p) for p in sorted(args.presets.glob("*.json"))}
+    queries  = load_queries(args.batch)
+
+    log = ReceiptLog(RECEIPTS)
+    reader = log.reader()
+    try:
+        manifest = run(registry, queries, presets, reader, args.batch_out, k=args.top_k)
+    finally:
+        reader.close()
+    append_score_run(log, args.batch_out / "manifest.json", manifest["generated_at"])
+
+def append_score_run(log, path, observed_at):
     # Append deterministic score_run receipt
+    out_path = path.resolve()
     evt = {
-        "observed_at": out["generated_at"],
+        "observed_at": observed_at,
         "kind": "score_run",
         "provider_id": None,
-        "source": {"filename": str(RANKINGS.relative_to(ROOT))},
-        "sha256": sha256_file(RANKINGS),
-        "size_bytes": RANKINGS.stat().st_size
+        "source": {"filename": str(out_path.relative_to(ROOT) if out_path.is_relative_to(ROOT) else out_path)},
+        "sha256": sha256_file(path),
+        "size_bytes": path.stat().st_size
     }
-    lines = []
-    if RECEIPTS.exists():
-        lines = [l for l in RECEIPTS.read_text(encoding="utf-8").splitlines() if l.strip()]
-    import json as _json
-    lines.append(_json.dumps(evt, sort_keys=True, separators=(",", ":")))
-    lines = sorted(lines)
-    RECEIPTS.parent.mkdir(parents=True, exist_ok=True)
-    RECEIPTS.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    line = json.dumps(evt, sort_keys=True, separators=(",", ":"))
+    log.append([line])
+    return line
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,154 @@
+import argparse, asyncio, math, sys
+from urllib.parse import urlsplit, parse_qs
+from .common import read_json, json_bytes
+from .cache import RankingCache, key
+from .receipts import ReceiptLog
+from .score import REGISTRY, RECEIPTS, PRESETS, Registry, rank, matrix, preset_label
+from .postcodes import POSTCODES_CSV
+from .extract import OVERLAY
+
+# Long-lived ranking service: registry, presets and receipt index are loaded
+# once into a Snapshot; a watcher swaps in a fresh Snapshot when any of them
+# changes on disk. Answers are byte-identical to what cli.score would write for
+# the same query, and /top5 answers go through the ranking cache (cli.cache),
+# shared on disk with cli.score. The service is read-only: it never appends
+# score_run receipts.
+#
+#   python -m cli.serve --port 8080
+#   GET /top5?postcode=2000&radius_km=20&budget_per_day=90&needs=memory_support&preset=balanced[&k=5]
+#       [&must_have=secure_unit,...][&needs_match=any|overlap]
+#   GET /matrix?<same query>   component matrix, re-weighted client-side (cli.score.matrix)
+#   GET /healthz               provider count and ranking cache hit/miss counters
+
+RELOAD_POLL_S = 1.0
+MAX_K = 100
+REASONS = {200:'OK', 400:'Bad Request', 404:'Not Found', 405:'Method Not Allowed', 500:'Internal Server Error'}
+
+def _stat(path):
+    try: st = path.stat(); return (st.st_size, st.st_mtime_ns)
+    except OSError: return None
+
+def stamp():
+    return (_stat(REGISTRY), _stat(OVERLAY), _stat(POSTCODES_CSV), tuple((p.name, _stat(p)) for p in sorted(PRESETS.glob('*.json'))), ReceiptLog(RECEIPTS).stamp())
+
+class Snapshot:
+    def __init__(self):
+        self.stamp = stamp()
+        self.registry = Registry.load()
+        self.presets = {p.stem: read_json(p) for p in sorted(PRESETS.glob('*.json'))}
+        self.receipts = ReceiptLog(RECEIPTS).reader()
+        # cache key part; None (no caching) if an input moved while loading
+        self.receipts_digest = self.receipts.digest()
+        if stamp() != self.stamp: self.receipts_digest = None
+
+    def close(self):
+        self.receipts.close()
+
+def parse_query(qs):
+    q = parse_qs(qs, keep_blank_values=True)
+    one = lambda k, default=None: q[k][-1] if q.get(k, [''])[-1] != '' else default
+    if one('postcode') is None: raise ValueError('postcode is required')
+    num = lambda k, default: float(one(k, default))
+    query = {
+        "budget_per_day": num('budget_per_day', 100.0),
+        "needs": [n for v in q.get('needs', []) for n in v.split(',') if n],
+        "postcode": one('postcode'),
+        "radius_km": num('radius_km', 20.0),
+    }
+    must_have = [n for v in q.get('must_have', []) for n in v.split(',') if n]
+    if must_have: query["must_have"] = must_have
+    if one('needs_match') is not None: query["needs_match"] = one('needs_match')
+    if not all(math.isfinite(query[k]) for k in ("budget_per_day", "radius_km")): raise ValueError('non-finite number')
+    k = int(one('k', 5))
+    if not 1 <= k <= MAX_K: raise ValueError(f'k must be between 1 and {MAX_K}')
+    return query, one('preset', 'balanced'), k
+
+class App:
+    def __init__(self):
+        self.snap = Snapshot()
+        self.cache = RankingCache()
+
+    def changed(self):
+        return stamp() != self.snap.stamp
+
+    def swap(self, snap):
+        old, self.snap = self.snap, snap
+        old.close()
+
+    def handle(self, method, target):
+        url = urlsplit(target)
+        if method != 'GET': return 405, json_bytes({"error": "GET only"})
+        if url.path == '/healthz': return 200, json_bytes({"ok": True, "providers": len(self.snap.registry.cols), "cache": self.cache.stats()})
+        if url.path not in ('/top5', '/matrix'): return 404, json_bytes({"error": "not found"})
+        try:
+            query, preset, k = parse_query(url.query)
+            weights = self.snap.presets.get(preset)
+            if weights is None: raise ValueError(f'unknown preset {preset!r}')
+            snap, label = self.snap, preset_label(preset)
+            if url.path == '/matrix':   # the whole pool's components: cached like rankings, k plays no part
+                ck = key(query, label, weights, None, snap.registry.sha256, snap.receipts_digest, kind='matrix') if snap.receipts_digest else None
+                return 200, self.cache.get_or_put(ck, lambda: json_bytes(matrix(snap.registry, query, weights, label, snap.receipts)))
+            ck = key(query, label, weights, k, snap.registry.sha256, snap.receipts_digest) if snap.receipts_digest else None
+            return 200, self.cache.get_or_put(ck, lambda: json_bytes(rank(snap.registry, query, weights, label, snap.receipts, k=k)))
+        except ValueError as e:
+            return 400, json_bytes({"error": str(e)})
+
+async def _connection(app, reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line: break
+            parts = line.decode('latin-1').split()
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b'\r\n', b'\n', b''): break
+                k, _, v = h.decode('latin-1').partition(':'); headers[k.strip().lower()] = v.strip()
+            if int(headers.get('content-length') or 0): await reader.readexactly(int(headers['content-length']))
+            if len(parts) != 3:
+                status, body = 400, json_bytes({"error": "malformed request line"}); keep = False
+            else:
+                keep = parts[2] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try: status, body = app.handle(parts[0], parts[1])
+                except Exception as e: status, body = 500, json_bytes({"error": repr(e)})
+            writer.write((f'HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n'
+                          f'Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\n'
+                          + ('' if keep else 'Connection: close\r\n') + '\r\n').encode('latin-1') + body)
+            await writer.drain()
+            if not keep: break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def _watch(app, poll):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(poll)
+        try:
+            if await loop.run_in_executor(None, app.changed):
+                # build off-loop, swap on-loop: no request ever sees a half-loaded snapshot
+                app.swap(await loop.run_in_executor(None, Snapshot))
+                print('reloaded', file=sys.stderr)
+        except Exception as e:
+            print(f'reload failed, keeping previous snapshot: {e!r}', file=sys.stderr)
+
+async def serve(host, port, poll=RELOAD_POLL_S):
+    app = App()
+    server = await asyncio.start_server(lambda r, w: _connection(app, r, w), host, port)
+    watcher = asyncio.create_task(_watch(app, poll))
+    print(f'serving on http://{host}:{port}', file=sys.stderr)
+    try:
+        async with server: await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.serve')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8080)
+    ap.add_argument('--poll', type=float, default=RELOAD_POLL_S, help='seconds between reload checks')
+    a = ap.parse_args(argv)
+    try: asyncio.run(serve(a.host, a.port, a.poll))
+    except KeyboardInterrupt: pass
+if __name__ == '__main__': main()
@@ -0,0 +1,87 @@
+import math
+import numpy as np
+from .columnar import haversine_km
+
+# Lat/lng grid over the registry rows, stored CSR-style: `cells` holds the
+# sorted occupied cell ids, `starts` the offsets of each cell's run in `rows`.
+# Persisted next to other derived data and keyed by the registry's sha256.
+
+CELL_DEG = 0.25
+KM_PER_DEG = 6371.0 * math.pi / 180.0
+
+class GridIndex:
+    def __init__(self, cells, starts, rows, cell_deg, registry_sha256):
+        self.cells, self.starts, self.rows = cells, starts, rows
+        self.cell_deg = float(cell_deg)
+        self.registry_sha256 = str(registry_sha256)
+        self.n_lat = int(math.ceil(180.0 / self.cell_deg)) + 1
+        self.n_lng = int(math.ceil(360.0 / self.cell_deg))
+
+    @classmethod
+    def build(cls, cols, registry_sha256, cell_deg=CELL_DEG):
+        idx = cls(None, None, None, cell_deg, registry_sha256)
+        rows = np.flatnonzero(~np.isnan(cols.lat) & ~np.isnan(cols.lng))
+        ids = idx._cell_ids(cols.lat[rows], cols.lng[rows])
+        order = np.argsort(ids, kind="stable")
+        ids, idx.rows = ids[order], rows[order].astype(np.int64)
+        idx.cells, first = np.unique(ids, return_index=True)
+        idx.starts = np.append(first, len(ids)).astype(np.int64)
+        return idx
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            return cls(z["cells"], z["starts"], z["rows"], z["cell_deg"], z["registry_sha256"])
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, cells=self.cells, starts=self.starts, rows=self.rows,
+                     cell_deg=self.cell_deg, registry_sha256=self.registry_sha256)
+
+    def _lat_row(self, lat):
+        return np.floor((np.clip(lat, -90.0, 90.0) + 90.0) / self.cell_deg).astype(np.int64)
+
+    def _lng_col(self, lng):
+        return np.floor(np.mod(lng + 180.0, 360.0) / self.cell_deg).astype(np.int64) % self.n_lng
+
+    def _cell_ids(self, lat, lng):
+        return self._lat_row(lat) * self.n_lng + self._lng_col(lng)
+
+    def _bbox_rows(self, lat, lng, radius_km):
+        dlat = radius_km / KM_PER_DEG
+        lat_lo, lat_hi = lat - dlat, lat + dlat
+        r0, r1 = int(self._lat_row(lat_lo)), int(self._lat_row(lat_hi))
+        widest = max(abs(lat_lo), abs(lat_hi))
+        if widest >= 90.0 or radius_km / (KM_PER_DEG * math.cos(math.radians(widest))) >= 180.0:
+            col_ranges = [(0, self.n_lng - 1)]
+        else:
+            dlng = radius_km / (KM_PER_DEG * math.cos(math.radians(widest)))
+            c0, c1 = int(self._lng_col(lng - dlng)), int(self._lng_col(lng + dlng))
+            col_ranges = [(c0, c1)] if c0 <= c1 else [(c0, self.n_lng - 1), (0, c1)]
+        out = []
+        for r in range(r0, r1 + 1):
+            for c0, c1 in col_ranges:
+                lo = np.searchsorted(self.cells, r * self.n_lng + c0, side="left")
+                hi = np.searchsorted(self.cells, r * self.n_lng + c1, side="right")
+                if hi > lo:
+                    out.append(self.rows[self.starts[lo]:self.starts[hi]])
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.int64)
+
+    def within(self, cols, origin, radius_km):
+        # exact great-circle filter over the bounding-box candidates, row order kept
+        rows = np.sort(self._bbox_rows(origin["lat"], origin["lng"], radius_km))
+        d_km = haversine_km(origin["lat"], origin["lng"], cols.lat[rows], cols.lng[rows])
+        return rows[d_km <= radius_km]
+
+def load_or_build(path, cols, registry_sha256, cell_deg=CELL_DEG):
+    if path.exists():
+        try:
+            idx = GridIndex.load(path)
+            if idx.registry_sha256 == registry_sha256 and idx.cell_deg == cell_deg:
+                return idx
+        except (OSError, ValueError, KeyError):
+            pass
+    idx = GridIndex.build(cols, registry_sha256, cell_deg)
+    idx.save(path)
+    return idx
@@ -0,0 +1,96 @@
+import argparse, csv, json
+from pathlib import Path
+import numpy as np
+from .common import write_json
+from .receipts import ReceiptLog
+ROOT = Path(__file__).resolve().parents[1]
+POSTCODES_CSV = ROOT/'config'/'postcodes.csv'
+SEED = 20250908
+
+# Deterministic synthetic data for benchmarks: same (n, seed) -> same bytes.
+# Providers sit around real postcode centroids, so the canned query and the
+# spatial index see realistic density; the price mix matches the registry
+# (explicit price_per_day, RAD/MPIR only, or neither).
+
+TAGS = ['memory_support', 'dementia_care', 'palliative_care', 'respite', 'culturally_diverse',
+        'lgbti_inclusive', 'veterans', 'short_term_restorative']
+TAG_P = [0.35, 0.25, 0.2, 0.3, 0.15, 0.1, 0.05, 0.1]
+
+def provider_id(i):
+    return f'synth-{i:07d}'
+
+def _centroids(path=POSTCODES_CSV):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [(r['postcode'], float(r['lat']), float(r['lng'])) for r in csv.DictReader(f)]
+
+def registry(n, seed=SEED, postcodes_csv=POSTCODES_CSV):
+    rng = np.random.default_rng(seed)
+    pcs = _centroids(postcodes_csv)
+    pick = rng.integers(0, len(pcs), n)
+    jitter = rng.normal(0.0, 0.03, (n, 2))
+    mix = rng.random(n)
+    price = np.round(rng.lognormal(np.log(120.0), 0.35, n), 2)
+    rad = rng.integers(200, 1200, n) * 1000
+    mpir = rng.integers(700, 900, n) / 100
+    stars = rng.integers(1, 6, n).astype(float); stars[rng.random(n) < 0.05] = np.nan
+    tags = rng.random((n, len(TAGS))) < np.array(TAG_P)
+    out = []
+    for i in range(n):
+        pc, lat, lng = pcs[pick[i]]
+        p = {"provider_id": provider_id(i), "name": f"Synthetic Care {i}", "postcode": pc,
+             "suburb": "SYNTH", "address": f"{i} Synthetic Street, SYNTH, {pc}",
+             "lat": round(lat + jitter[i, 0], 8), "lng": round(lng + jitter[i, 1], 8),
+             "star_overall": None if np.isnan(stars[i]) else float(stars[i]),
+             "tags": [t for t, on in zip(TAGS, tags[i]) if on]}
+        if mix[i] < 0.4: p["price_per_day"] = float(price[i])
+        elif mix[i] < 0.9: p["rad"], p["mpir"] = int(rad[i]), float(mpir[i])
+        out.append(p)
+    return out
+
+def corpus(n, out_dir, seed=SEED):
+    # n provider dirs of the three text documents ingest expects, with
+    # lognormal complaint logs and an occasional multi-MB binary report
+    rng = np.random.default_rng(seed + 1)
+    files = total = 0
+    for i in range(n):
+        d = Path(out_dir)/provider_id(i); d.mkdir(parents=True, exist_ok=True)
+        docs = {'pricing.txt': f'RAD: {int(rng.integers(200, 1200)) * 1000}\nMPIR: {int(rng.integers(700, 900)) / 100}\n',
+                'stars.txt': f'Stars Overall: {int(rng.integers(10, 51)) / 10}\n',
+                'complaints.txt': ''.join(f'Complaint {k}: resolved\n' for k in range(int(rng.lognormal(1.0, 1.5))))
+                                  or 'Complaints: none\n'}
+        for name, text in docs.items():
+            (d/name).write_text(text, encoding='utf-8'); files += 1; total += len(text)
+        if rng.random() < 0.02:
+            blob = rng.bytes(int(rng.integers(256 << 10, 4 << 20)))
+            (d/'report.bin').write_bytes(blob); files += 1; total += len(blob)
+    return files, total
+
+def receipts(n, providers, seed=SEED):
+    # n doc_ingest events spread over 2025 up to the fixed ingest date
+    rng = np.random.default_rng(seed + 2)
+    days = np.datetime64('2025-01-01') + rng.integers(0, 250, n)
+    lines = []
+    for i in range(n):
+        pid = provider_id(int(rng.integers(0, providers)))
+        evt = {"observed_at": f'{days[i]}T{int(rng.integers(0, 24)):02d}:00:00Z', "kind": "doc_ingest",
+               "provider_id": pid, "source": {"filename": f'corpus/{pid}/history-{i}.txt'},
+               "sha256": rng.bytes(32).hex(), "size_bytes": int(rng.integers(16, 1 << 16))}
+        lines.append(json.dumps(evt, sort_keys=True, separators=(',', ':')))
+    return lines
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m cli.synth')
+    ap.add_argument('what', choices=['registry', 'corpus', 'receipts'])
+    ap.add_argument('--n', type=int, required=True)
+    ap.add_argument('--seed', type=int, default=SEED)
+    ap.add_argument('--providers', type=int, help='receipts: provider ids to draw from (default n)')
+    ap.add_argument('--out', type=Path, required=True, help='providers.json, corpus dir, or receipt log base to extend')
+    a = ap.parse_args(argv)
+    if a.what == 'registry':
+        write_json(a.out, registry(a.n, a.seed))
+    elif a.what == 'corpus':
+        files, size = corpus(a.n, a.out, a.seed); print(f'{files} files, {size} bytes -> {a.out}')
+    else:
+        log = ReceiptLog(a.out)
+        log.reset([*log.lines(), *receipts(a.n, a.providers or a.n, a.seed)])
+if __name__ == '__main__': main()
@@ -0,0 +1,48 @@
+import json
+from cli.batch import load_queries, run
+from cli.common import json_bytes
+from cli.receipts import ReceiptLog
+from cli.score import Registry, rank, preset_label
+QUERIES = [{"id":"canned","budget_per_day":90.0,"needs":["memory_support"],"postcode":"2000","radius_km":20.0},
+           {"budget_per_day":60,"needs":[],"postcode":"2010","radius_km":5},
+           {"budget_per_day":120.5,"needs":["memory_support","secure_unit"],"postcode":"2611.0","radius_km":50,"margin_km":0},
+           {"budget_per_day":90,"needs":[],"postcode":"6000","radius_km":0.01,"margin_km":0},
+           {"budget_per_day":100,"needs":[],"postcode":"0810","radius_km":1,"margin_km":0},
+           {"budget_per_day":90,"needs":[],"postcode":"9999","radius_km":10},
+           {"budget_per_day":90,"needs":[],"postcode":"2000","radius_km":10,"needs_match":"most"}]
+PRESETS = {"balanced":{"w_location":0.3,"w_needs":0.1,"w_price":0.3,"w_quality":0.3},
+           "near_first":{"w_location":0.6,"w_needs":0.2,"w_price":0.1,"w_quality":0.1}}
+def test_batch_matches_single_runs(tmp_path):
+    (tmp_path/'q.jsonl').write_text(''.join(json.dumps(q) + '\n' for q in QUERIES))
+    registry = Registry.load(); reader = ReceiptLog().reader(); queries = load_queries(tmp_path/'q.jsonl')
+    manifest = run(registry, queries, PRESETS, reader, tmp_path, k=7)
+    assert [(e['query_id'], e.get('preset')) for e in manifest['rankings']] == \
+        [(qid, p) for qid, _ in queries[:5] for p in sorted(PRESETS)] + [('q000005', None), ('q000006', None)]
+    for qid, q in queries[:5]:
+        for name, weights in PRESETS.items():
+            assert (tmp_path/f'{qid}__{name}.json').read_bytes() == json_bytes(rank(registry, q, weights, preset_label(name), reader, k=7))
+def test_must_have_and_overlap_match_single_runs(tmp_path):
+    import random
+    from cli import spatial
+    from cli.columnar import Columns
+    r = random.Random(5); tags = ['memory_support', 'secure_unit', 'respite']
+    providers = [{"provider_id": f"p{i:03d}", "lat": -33.87 + r.gauss(0, 0.3), "lng": 151.21 + r.gauss(0, 0.3),
+                  "price_per_day": r.choice([None, 70.0, 95.0]), "star_overall": r.choice([None, 3.0, 4.5]),
+                  "tags": r.sample(tags, r.randrange(4))} for i in range(400)]
+    real = Registry.load(); cols = Columns.from_providers(providers)
+    registry = Registry(cols, spatial.GridIndex.build(cols, 'test'), real.postcodes)
+    queries = [("must", {"budget_per_day": 90, "needs": ["respite"], "must_have": ["memory_support", "secure_unit"], "postcode": "2000", "radius_km": 5}),
+               ("far", {"budget_per_day": 90, "needs": [], "must_have": ["respite"], "postcode": "6000", "radius_km": 5}),
+               ("none", {"budget_per_day": 90, "needs": [], "must_have": ["nope"], "postcode": "2000", "radius_km": 5}),
+               ("graded", {"budget_per_day": 90, "needs": tags, "needs_match": "overlap", "postcode": "2000", "radius_km": 20})]
+    reader = ReceiptLog().reader()
+    run(registry, queries, PRESETS, reader, tmp_path, k=7)
+    for qid, q in queries:
+        for name, weights in PRESETS.items():
+            out = rank(registry, q, weights, preset_label(name), reader, k=7)
+            assert (tmp_path/f'{qid}__{name}.json').read_bytes() == json_bytes(out)
+            tagged = {p["provider_id"]: set(p["tags"]) for p in providers}
+            assert all(set(q.get("must_have", [])) <= tagged[i["provider_id"]] for i in out["items"])
+            assert (len(out["items"]) == 7) == (qid != "none")
+    graded = {round(i["components"]["needs"], 6) for i in rank(registry, queries[3][1], PRESETS["near_first"], "x", reader, k=50)["items"]}
+    assert graded - {0.0, 1.0}
@@ -0,0 +1,47 @@
+import json, subprocess, sys
+from pathlib import Path
+from cli import cache
+from cli.cache import RankingCache
+from cli.serve import App
+ROOT = Path(__file__).resolve().parents[1]
+def test_tiers_eviction_and_counters(tmp_path):
+    c = RankingCache(tmp_path, max_entries=2, max_bytes=350)
+    for i in range(4): c.put(f'k{i}', bytes([65 + i]) * 100)
+    assert list(c.memory) == ['k2', 'k3'] and c.get('k3') == b'D' * 100
+    assert c.get('k1') is None and sorted(p.name for p in tmp_path.iterdir()) == ['k2.json', 'k3.json']   # disk bound: oldest out
+    c2 = RankingCache(tmp_path)
+    assert c2.get('k2') == b'C' * 100 and c2.get('k2') == b'C' * 100 and c2.get('nope') is None
+    assert c2.counters() == {"memory_hits": 1, "disk_hits": 1, "misses": 1} and c2.stats()["disk_bytes"] == 200
+    calls = []
+    assert c2.get_or_put(None, lambda: calls.append(1) or b'x') == c2.get_or_put(None, lambda: calls.append(1) or b'x') and len(calls) == 2
+    args = ({"postcode": "2000"}, "Balanced", {"w_location": 1}, 5, "r" * 64, "d" * 64)
+    variants = [args[:i] + (x,) + args[i + 1:] for i, x in enumerate(({"postcode": 2000}, "Near", {"w_location": 0.5}, 6, "s" * 64, "e" * 64))]
+    assert len({cache.key(*a) for a in [args, *variants]}) == 7
+def test_version_follows_the_scoring_code(tmp_path):
+    for name in cache.SCORING_MODULES: (tmp_path/f'{name}.py').write_bytes((ROOT/'cli'/f'{name}.py').read_bytes())
+    assert cache.code_version(tmp_path) == cache.CACHE_VERSION
+    with open(tmp_path/'fee_math.py', 'a') as f: f.write('\n# tweak\n')
+    assert cache.code_version(tmp_path) != cache.CACHE_VERSION
+def test_cached_rankings_are_byte_identical():
+    run = lambda *a: subprocess.check_call([sys.executable, '-m', *a], cwd=ROOT)
+    run('cli.ingest'); run('cli.score', '--no-cache'); fresh = (ROOT/'rankings'/'top5.json').read_bytes()
+    for _ in range(2):
+        run('cli.ingest'); run('cli.score'); assert (ROOT/'rankings'/'top5.json').read_bytes() == fresh
+    app = App(); q = '/top5?postcode=2000&radius_km=20&budget_per_day=90&needs=memory_support'
+    bodies = [app.handle('GET', q)[1] for _ in range(3)]
+    assert bodies[0] == bodies[1] == bodies[2] == fresh
+    counters = json.loads(app.handle('GET', '/healthz')[1])['cache']
+    assert counters['memory_hits'] == 2 and counters['disk_hits'] + counters['misses'] == 1
+def test_back_to_back_runs_hit_and_digest_skips_score_run(tmp_path):
+    from cli import score
+    from cli.receipts import ReceiptLog, MemoryReader
+    subprocess.check_call([sys.executable, '-m', 'cli.ingest'], cwd=ROOT)
+    log = ReceiptLog(); lines = list(log.lines())
+    r = log.reader(); d0 = r.digest(); r.close()
+    assert MemoryReader(lines, [json.loads(l) for l in lines]).digest() == d0
+    c = RankingCache(tmp_path); out = tmp_path/'top5.json'
+    score.run(out, ranking_cache=c); first = out.read_bytes()
+    r = log.reader(); assert r.digest() == d0; r.close()   # its own score_run receipt is not part of the key
+    score.run(out, ranking_cache=c); assert out.read_bytes() == first
+    score.run(out); assert out.read_bytes() == first
+    assert c.counters() == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
@@ -0,0 +1,47 @@
+import random
+import cli.columnar as columnar
+from cli.columnar import Columns, score, best, best_parallel, item, COMPONENTS
+from cli.common import haversine_km
+from cli.fee_math import dap_from_rad
+W = {"w_location":0.3,"w_needs":0.1,"w_price":0.3,"w_quality":0.3}
+def clamp01(x): return max(0.0, min(1.0, x))
+def loop_score(p, origin, radius_km, budget, needs):
+    loc = 0.0 if p.get("lat") is None else 1.0 - clamp01(haversine_km(origin["lat"], origin["lng"], p["lat"], p["lng"]) / max(radius_km, 0.1))
+    pd = p.get("price_per_day")
+    if pd is None and p.get("rad") is not None and p.get("mpir") is not None: pd = dap_from_rad(p["rad"], p["mpir"])
+    price = 0.5 if pd is None else 1.0 if pd <= budget else clamp01(1.0 - ((pd - budget) / max(budget, 1.0)))
+    qual = 0.5 if p.get("star_overall") is None else clamp01(float(p["star_overall"]) / 5.0)
+    need = 1.0 if any(t in needs for t in p.get("tags") or []) else 0.0
+    return round(W["w_location"]*loc + W["w_price"]*price + W["w_quality"]*qual + W["w_needs"]*need, 6), round(loc, 6), round(price, 6), round(qual, 6), need
+def test_columnar_matches_loop(monkeypatch):
+    r = random.Random(7); tags = ['memory_support','secure_unit','respite']; providers = []
+    for i in range(300):
+        p = {"provider_id":f"p{r.randrange(200)}","name":"x","postcode":"2000","tags":r.sample(tags, r.randrange(3)),
+             "lat":-33.87+r.gauss(0,0.1),"lng":151.21+r.gauss(0,0.1),"star_overall":r.choice([None,3.0,4.2])}
+        if r.random() < 0.1: p["lat"] = p["lng"] = None
+        if r.random() < 0.4: p["price_per_day"] = round(r.uniform(40, 160), 2)
+        elif r.random() < 0.5: p.update(rad=500000, mpir=8.36)
+        providers.append(p)
+    origin = {"lat": -33.8688, "lng": 151.2093}; needs = {"memory_support"}
+    cols = Columns.from_providers(providers); comps = score(cols, origin, 20.0, 90.0, needs, W)
+    for i, p in enumerate(providers):
+        it = item(cols.provider_ids[i], {c: float(comps[c][i]) for c in COMPONENTS}, [])
+        assert (it["fit_score"], *it["components"].values()) == loop_score(p, origin, 20.0, 90.0, needs)
+    ref = sorted(range(len(providers)), key=lambda i: (-loop_score(providers[i], origin, 20.0, 90.0, needs)[0], providers[i]["provider_id"]))
+    params = (origin, 20.0, 90.0, needs, W)
+    assert [row for _, row, _ in best(cols, params, 5)] == ref[:5]
+    monkeypatch.setattr(columnar, 'CHUNK_ROWS', 7)
+    for k in (1, 5, 40, 400):
+        assert [row for _, row, _ in best(cols, params, k)] == ref[:k] == [row for _, row, _ in best_parallel(cols, params, k, 3)]
+def test_tag_index_and_overlap():
+    r = random.Random(3); tags = ['memory_support','secure_unit','respite','palliative','dementia']
+    providers = [{"provider_id":f"p{i}","tags":r.sample(tags, r.randrange(4))} for i in range(500)]
+    cols = Columns.from_providers(providers)
+    for must in ({'secure_unit'}, {'memory_support','respite'}, {'respite','palliative','dementia'}, {'nope'}, {'respite','nope'}):
+        ref = [i for i, p in enumerate(providers) if must <= set(p["tags"])]
+        assert cols.rows_with(must).tolist() == ref
+        sub = cols.take(list(range(0, 500, 3)))   # no postings: falls back to the bitsets
+        assert sub.rows_with(must).tolist() == [n for n, i in enumerate(range(0, 500, 3)) if i in ref]
+    needs = {'memory_support', 'secure_unit', 'unknown_tag'}
+    assert columnar.needs_component(cols, needs, "overlap").tolist() == [len(needs & set(p["tags"])) / 3 for p in providers]
+    assert columnar.needs_component(cols, set(), "overlap").tolist() == [0.0] * 500
@@ -0,0 +1,27 @@
+import os
+import cli.extract as extract
+import cli.ingest as ingest
+from cli.common import sha256_file
+DOCS = {'pricing.txt': 'RAD: 500,000\nMPIR: 8.36\n', 'stars.txt': 'Stars Overall: 4.2\nStars Clinical: 5\n',
+        'complaints.txt': 'Complaint 1: resolved\nComplaint 2: open\n'}
+def test_extract_parses_once_per_content_hash(tmp_path, monkeypatch):
+    for d in ('a', 'b'):
+        (tmp_path/'corpus'/d).mkdir(parents=True)
+        for name, text in DOCS.items(): (tmp_path/'corpus'/d/name).write_text(text)
+    (tmp_path/'corpus'/'b'/'notes.bin').write_bytes(b'\x00\xff')
+    for f in (tmp_path/'corpus').rglob('*'): os.utime(f, ns=(10**18, 10**18))
+    monkeypatch.setattr(ingest, 'ROOT', tmp_path); monkeypatch.setattr(ingest, 'CORPUS', tmp_path/'corpus')
+    monkeypatch.setattr(ingest, 'MANIFEST', tmp_path/'build'/'m.json')
+    monkeypatch.setattr(extract, 'CACHE', tmp_path/'build'/'cache.json'); monkeypatch.setattr(extract, 'OVERLAY', tmp_path/'build'/'overlay.json')
+    overlay, parsed, reused = extract.extract()
+    assert (parsed, reused) == (3, 3)   # b's documents duplicate a's
+    assert overlay['a'] == overlay['b'] and overlay['a']['fields'] == {
+        'rad': 500000, 'mpir': 8.36, 'star_overall': 4.2, 'star_clinical': 5.0, 'complaints_count': 2}
+    assert overlay['a']['sources']['mpir'] == sha256_file(tmp_path/'corpus'/'a'/'pricing.txt')
+    def boom(*a): raise AssertionError('cached document re-parsed')
+    monkeypatch.setitem(extract.PARSERS, 'pricing.txt', boom)
+    assert extract.extract()[1:] == (0, 6)
+    stars = tmp_path/'corpus'/'b'/'stars.txt'; stars.write_text('Stars Overall: 3.1\n'); os.utime(stars, ns=(10**18, 10**18 + 1))
+    overlay, parsed, reused = extract.extract()
+    assert (parsed, reused) == (1, 5) and overlay['b']['fields']['star_overall'] == 3.1 and 'star_clinical' not in overlay['b']['fields']
+    assert extract.read_json(extract.OVERLAY) == overlay and len(extract.load_cache()) == 4
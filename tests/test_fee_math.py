@@ -0,0 +1,35 @@
+import math, random, struct
+import numpy as np
+from cli.fee_math import dap_from_rad, dap_from_rad_decimal, dap_batch
+
+def _outcome(f, a, b):
+    try: v = f(a, b)
+    except Exception as e: return type(e)
+    return 'nan' if math.isnan(v) else (v, math.copysign(1.0, v))
+
+def _values(rnd):
+    bits = lambda: struct.unpack('<d', rnd.getrandbits(64).to_bytes(8, 'little'))[0]
+    picks = [bits, lambda: rnd.randrange(-10**9, 10**9) / 100, lambda: rnd.randrange(0, 3000) / 100,
+             lambda: rnd.uniform(-1e6, 1e6), lambda: rnd.randrange(-10**40, 10**40),
+             lambda: float(f'{rnd.uniform(0, 1e7):.{rnd.randrange(1, 9)}g}'),
+             lambda: rnd.choice([0.0, -0.0, 5e-324, 1e-5, 1e16, 1e26, 1e28, 1e308, -1e308, math.inf, -math.inf, math.nan])]
+    return lambda: rnd.choice(picks)()
+
+EDGES = [(182.5, 1.0), (-182.5, 1.0), (0.0, 8.5), (-0.0, 8.5), (1.0, -0.01), (36500.0, 0.5), (1e26, 1.0), (1e30, 365.0)]
+
+def test_fixed_point_matches_decimal():
+    rnd = random.Random(11); v = _values(rnd)
+    pairs = EDGES + [(v(), v()) for _ in range(40000)] + [(rnd.randrange(0, 10**8) / 100, rnd.randrange(0, 3000) / 100) for _ in range(40000)]
+    for a, b in pairs:
+        assert _outcome(dap_from_rad, a, b) == _outcome(dap_from_rad_decimal, a, b), (a, b)
+        assert _outcome(dap_from_rad, a, b) == _outcome(dap_from_rad, a, b)   # memo hit
+    floats = [(a, b) for a, b in pairs if isinstance(a, float) and isinstance(b, float)]
+    out = dap_batch([a for a, _ in floats], [b for _, b in floats])
+    for (a, b), got in zip(floats, out):
+        want = _outcome(dap_from_rad_decimal, a, b)
+        assert _outcome(lambda *_: float(got), a, b) == (want if isinstance(want, (tuple, str)) else 'nan'), (a, b)
+
+def test_batch_shapes_and_missing():
+    out = dap_batch(np.array([500000.0, np.nan, 182.5]), np.array([8.5, 8.5, 1.0]))
+    assert out[0] == dap_from_rad_decimal(500000.0, 8.5) and math.isnan(out[1]) and out[2] == 0.01
+    assert dap_batch([], []).shape == (0,)
@@ -0,0 +1,17 @@
+import os
+import cli.ingest as ingest
+from cli.common import sha256_file
+def test_manifest_reuse_and_rehash(tmp_path, monkeypatch):
+    for d in ('a', 'b'):
+        (tmp_path/'corpus'/d).mkdir(parents=True)
+        for n in ('pricing.txt', 'stars.txt'): (tmp_path/'corpus'/d/n).write_text(d+n)
+    for f in (tmp_path/'corpus').rglob('*.txt'): os.utime(f, ns=(10**18, 10**18))
+    monkeypatch.setattr(ingest, 'ROOT', tmp_path); monkeypatch.setattr(ingest, 'CORPUS', tmp_path/'corpus')
+    monkeypatch.setattr(ingest, 'RECEIPTS', tmp_path/'receipts'/'events.jsonl'); monkeypatch.setattr(ingest, 'MANIFEST', tmp_path/'build'/'m.json')
+    ingest.main([]); first = ingest.RECEIPTS.read_text()
+    def boom(*a): raise AssertionError('unchanged file re-hashed')
+    monkeypatch.setattr(ingest, 'sha256_file', boom)
+    ingest.main([]); assert ingest.RECEIPTS.read_text() == first
+    changed = tmp_path/'corpus'/'b'/'stars.txt'; changed.write_text('four stars now'); os.utime(changed, ns=(10**18, 10**18 + 1))
+    monkeypatch.setattr(ingest, 'sha256_file', sha256_file)
+    ingest.main([]); assert sha256_file(changed) in ingest.RECEIPTS.read_text() and ingest.RECEIPTS.read_text() != first
@@ -0,0 +1,42 @@
+import json
+from cli import digest
+def _evt(i, day):
+    return json.dumps({'event': 'doc_ingest', 'id': i, 'observed_at': f'2025-09-{day:02d}T12:00:00Z'}, sort_keys=True, separators=(',', ':'))
+def _ledger(tmp_path, monkeypatch):
+    monkeypatch.setattr(digest, 'LEDGER', tmp_path/'ledger'); monkeypatch.setattr(digest, 'INDEX', tmp_path/'ledger'/'index.json')
+    monkeypatch.setattr(digest, 'MERKLE', tmp_path/'merkle.sqlite')
+def test_chain_checkpoints_and_range(tmp_path, monkeypatch):
+    _ledger(tmp_path, monkeypatch)
+    lines = []
+    for day, n in ((8, 3), (9, 2), (11, 4)):
+        lines = sorted(lines + [_evt(f'{day}-{i}', day) for i in range(n)])
+        digest.build(lines)
+    digest.build(lines + [_evt('11-x', 11)])   # same-day rebuild replaces the entry, not the chain
+    lines.append(_evt('11-x', 11))
+    index = digest.load_index()
+    assert [e['date'] for e in index] == ['2025-09-08', '2025-09-09', '2025-09-11']
+    last = json.loads((tmp_path/'ledger'/'digest-2025-09-11.json').read_text())
+    assert last['checkpoint'] == {**last['checkpoint'], 'since': '2025-09-09', 'day_events': 5, 'events_count': 10}
+    assert last['events_count'] == 10 and last['prev_sha256'] == index[1]['sha256']
+    for e in index: assert digest.verify_day(e['date'], lines) == []
+    assert [e['date'] for e in digest.entries_between('2025-09-09', '2025-09-10')] == ['2025-09-09']
+    assert digest.entries_between('2025-09-12', '2025-09-30') == []
+    from cli.receipts import ReceiptLog
+    log = ReceiptLog(tmp_path/'receipts'/'events.jsonl'); log.reset(lines[:-2]); log.append(lines[-2:])   # base + active segment
+    monkeypatch.setattr(digest, 'RECEIPTS', log.base)
+    monkeypatch.setattr(ReceiptLog, 'lines', lambda self: (_ for _ in ()).throw(AssertionError('full log scan')))
+    for e in index: assert digest.verify_day(e['date']) == []   # through the day index
+    assert log.reader().lines_between('2025-09-08', '2025-09-09') == [l for l in lines if '09-09' in l]
+    (tmp_path/'ledger'/'index.json').unlink()   # rebuilt from the directory
+    assert digest.load_index() == index
+def test_verify_day_detects_tampering(tmp_path, monkeypatch):
+    _ledger(tmp_path, monkeypatch)
+    lines = [_evt('a', 8), _evt('b', 8)]; digest.build(lines)
+    lines = sorted(lines + [_evt('c', 9)]); digest.build(lines)
+    forged = [l.replace('"id":"c"', '"id":"d"') for l in lines]
+    assert digest.verify_day('2025-09-09', forged) and digest.verify_day('2025-09-08', forged) == []
+    p = tmp_path/'ledger'/'digest-2025-09-08.json'
+    p.write_text(p.read_text().replace('"events_count":2', '"events_count":3'))
+    assert any('index hash' in m for m in digest.verify_day('2025-09-08', lines))
+    assert any('prev_sha256' in m for m in digest.verify_day('2025-09-09', lines))
+    assert digest.verify_day('2025-09-10', lines) == ['no ledger entry for 2025-09-10']
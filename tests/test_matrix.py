@@ -0,0 +1,29 @@
+import json
+from cli.common import json_bytes
+from cli.receipts import ReceiptLog
+from cli.score import Registry, rank, matrix, rerank, preset_label
+from cli.serve import App
+QUERIES = [{"budget_per_day":90.0,"needs":["memory_support"],"postcode":"2000","radius_km":20.0},
+           {"budget_per_day":60,"needs":[],"postcode":"2010","radius_km":5},
+           {"budget_per_day":120.5,"needs":["memory_support"],"needs_match":"overlap","postcode":"2611.0","radius_km":50,"margin_km":0},
+           {"budget_per_day":90,"needs":[],"postcode":"6000","radius_km":0.01,"margin_km":0}]
+WEIGHTS = [{"w_location":0.3,"w_needs":0.1,"w_price":0.3,"w_quality":0.3}, {"w_location":0.9,"w_needs":0.0,"w_price":0.05,"w_quality":0.05},
+           {"w_location":0.0,"w_needs":0.5,"w_price":0.0,"w_quality":0.5}]
+def test_reweighted_matrix_matches_rank():
+    registry = Registry.load(); reader = ReceiptLog().reader()
+    for q in QUERIES:
+        m = json.loads(json_bytes(matrix(registry, q, WEIGHTS[0], "Balanced", reader)))   # through JSON, as served
+        assert len(m["provider_ids"]) == len(m["location"]) == len(m["needs"]) > 0
+        for w in WEIGHTS:
+            for k in (1, 5, 12):
+                assert json_bytes(rerank(m, w, "Custom", reader, k)) == json_bytes(rank(registry, q, w, "Custom", reader, k=k))
+        assert all(i["receipts"] == [] for i in rerank(m, WEIGHTS[1])["items"])
+def test_service_serves_matrix():
+    app = App()
+    target = '/matrix?postcode=2000&radius_km=20&budget_per_day=90&needs=memory_support&preset=balanced'
+    status, body = app.handle('GET', target)
+    hits = app.cache.memory_hits
+    assert status == 200 and app.handle('GET', target) == (200, body) and app.cache.memory_hits == hits + 1   # cached like /top5
+    m = json.loads(body)
+    assert m["preset"] == preset_label("balanced") and m["weights"] == app.snap.presets["balanced"]
+    assert json_bytes(rerank(m, m["weights"], receipts=app.snap.receipts)) == app.handle('GET', '/top5?postcode=2000&radius_km=20&budget_per_day=90&needs=memory_support')[1]
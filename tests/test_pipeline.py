@@ -0,0 +1,15 @@
+import subprocess, sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]; PY = sys.executable
+ARTIFACTS = ['rankings/top5.json', 'receipts/events.jsonl', 'ledger/digest-2025-09-08.json']
+def test_pipeline_matches_makefile_path_and_skips_noops():
+    for stage in (['cli.ingest'], ['cli.receipts', 'validate'], ['cli.extract'], ['cli.score'], ['cli.digest'], ['cli.receipts', 'compact']):
+        subprocess.check_call([PY, '-m', *stage], cwd=ROOT, stdout=subprocess.DEVNULL)
+    make = [(ROOT/a).read_bytes() for a in ARTIFACTS]
+    out = subprocess.check_output([PY, '-m', 'cli.pipeline', '--force'], cwd=ROOT, text=True)
+    assert out.startswith('extract=ran receipts=ran digest=ran') and [(ROOT/a).read_bytes() for a in ARTIFACTS] == make
+    out = subprocess.check_output([PY, '-m', 'cli.pipeline'], cwd=ROOT, text=True)
+    assert out.startswith('extract=skipped receipts=skipped digest=skipped') and [(ROOT/a).read_bytes() for a in ARTIFACTS] == make
+    (ROOT/ARTIFACTS[2]).unlink()
+    out = subprocess.check_output([PY, '-m', 'cli.pipeline'], cwd=ROOT, text=True)
+    assert out.startswith('extract=skipped receipts=skipped digest=ran') and [(ROOT/a).read_bytes() for a in ARTIFACTS] == make
@@ -0,0 +1,17 @@
+import pytest
+from cli.postcodes import PostcodeTable, build, load, normalize
+def test_compiled_table_lookup(tmp_path):
+    csv = tmp_path/'pc.csv'; out = tmp_path/'pc.bin'
+    csv.write_text('postcode,lat,lng\n3000,-37.81,144.96\n800,-12.46,130.84\n2611.0,-35.34,149.05\n2000,-33.8688,151.2093\n')
+    assert build(csv, out) == 4
+    t = PostcodeTable(out)
+    assert t.origin('2000') == {"lat": -33.8688, "lng": 151.2093} and t.get(2611.0) == {"lat": -35.34, "lng": 149.05}
+    assert t.get('0800')['lng'] == 130.84 and normalize('800') == '0800' and t.get('9999') is None
+    with pytest.raises(ValueError): t.origin('9999')
+    csv.write_text(csv.read_text() + '3000,-37.8,144.9\n')
+    with pytest.raises(ValueError): build(csv, out)
+    csv.write_text('postcode,lat,lng\n4000,-27.47,153.02\n')
+    assert len(load(csv, out)) == 1 and load(csv, out).get('4000') is not None
+def test_shipped_table_covers_capital_cbds():
+    t = load()
+    for pc in ('0800', '2000', '2600', '3000', '4000', '5000', '6000', '7000'): assert t.get(pc) is not None, pc
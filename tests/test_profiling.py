@@ -0,0 +1,17 @@
+import json, pstats
+from cli import profiling
+def test_spans_are_noops_when_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'METRICS', tmp_path/'m.jsonl'); monkeypatch.setattr(profiling, '_on', False)
+    with profiling.span('x', files=1) as s: s.add(bytes_read=5)
+    assert s is profiling.NULL and not (tmp_path/'m.jsonl').exists()
+def test_spans_record_counters_and_pstats(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'METRICS', tmp_path/'m.jsonl')
+    monkeypatch.setattr(profiling, '_on', False); monkeypatch.setattr(profiling, '_pstats', None); monkeypatch.setattr(profiling, '_program', None)
+    profiling.enable(pstats='inner', program='test')
+    with profiling.span('outer', files=2) as s:
+        s.add(bytes_read=10); s.add(bytes_read=5)
+        with profiling.span('inner'): sorted(range(1000))
+    recs = [json.loads(l) for l in (tmp_path/'m.jsonl').read_text().splitlines()]
+    assert [r['span'] for r in recs] == ['inner', 'outer'] and recs[1]['files'] == 2 and recs[1]['bytes_read'] == 15
+    assert all(r['program'] == 'test' and r['ok'] and r['wall_s'] >= 0 for r in recs)
+    assert pstats.Stats(str(tmp_path/'profile-inner.pstats')).total_calls > 0
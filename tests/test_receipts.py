@@ -0,0 +1,60 @@
+import json, random
+import cli.receipts as receipts
+from cli.receipts import ReceiptLog
+def test_segmented_view_matches_full_sort(tmp_path, monkeypatch):
+    monkeypatch.setattr(receipts, 'ACTIVE_MAX_LINES', 5); monkeypatch.setattr(receipts, 'MAX_SEGMENTS', 3)
+    r = random.Random(5); base = tmp_path/'receipts'/'events.jsonl'; log = ReceiptLog(base)
+    everything = [f'{{"n":{r.randrange(50)}}}' for _ in range(10)]; log.reset(everything)
+    for _ in range(40):
+        batch = [f'{{"n":{r.randrange(50)}}}' for _ in range(r.randrange(1, 4))]
+        log.append(batch); everything += batch
+        assert list(ReceiptLog(base).lines()) == sorted(everything)
+        assert len(log.sealed()) <= 3
+    log.compact()
+    assert base.read_text().splitlines() == sorted(everything) and log.files() == [base]
+def test_interrupted_compaction_is_finished_on_open(tmp_path):
+    base = tmp_path/'events.jsonl'; log = ReceiptLog(base)
+    a, b, c, d = ('{"n":%d}' % i for i in range(4))
+    log.reset([b, d]); log.append([a, c]); log.seal()
+    # crash after journalling, before the new base replaced the old one
+    (tmp_path/'events.jsonl.tmp').write_text(f'{a}\n{b}\n{c}\n{d}\n'); log.pending.write_text(log.sealed()[-1].name)
+    assert list(ReceiptLog(base).lines()) == [a, b, c, d] and not log.sealed()
+def test_provider_index_matches_full_scan(tmp_path):
+    r = random.Random(9); base = tmp_path/'events.jsonl'; log = ReceiptLog(base)
+    evt = lambda: json.dumps({"observed_at":f"2025-09-{r.randrange(1, 29):02d}T00:00:00Z","provider_id":r.choice(["a","b","c",None]),"n":r.random()}, sort_keys=True)
+    log.reset([evt() for _ in range(200)]); log.append([evt() for _ in range(20)])
+    def full_scan():
+        by = {}
+        for line in log.lines():
+            e = json.loads(line)
+            if e["provider_id"]: by.setdefault(e["provider_id"], []).append(e)
+        return by, max(json.loads(l)["observed_at"] for l in log.lines())
+    by, latest = full_scan()
+    assert log.receipts_for(["a", "c", "zz"]) == {k: by[k] for k in ("a", "c")} and log.latest_observed() == latest
+    base.write_text('\n' + ''.join(l + '\n' for l in sorted(base.read_text().splitlines() + [evt()])))  # behind the index's back
+    by, latest = full_scan()
+    assert log.receipts_for(["a", "b"]) == {k: by[k] for k in ("a", "b")} and log.latest_observed() == latest
+def test_validate_reports_schema_order_and_duplicate_errors(tmp_path):
+    base = tmp_path/'events.jsonl'; log = ReceiptLog(base)
+    evt = lambda i, kind='doc_ingest': json.dumps({"kind":kind,"observed_at":f"2025-09-08T00:00:{i:02d}Z","provider_id":"p","sha256":"%064d" % i,"size_bytes":i}, sort_keys=True, separators=(',', ':'))
+    good = sorted([evt(i) for i in range(40)] + [evt(99, 'score_run')] * 2)
+    log.reset(good)
+    assert receipts.validate(log, workers=2, chunk_bytes=300) == {"files": 1, "lines": 42, "error_count": 0, "errors": []}
+    lines = list(good); lines[5], lines[6] = lines[6], lines[5]; lines[20] = lines[19]; lines[30] = '{"kind":"bogus"}'; lines.insert(10, '')
+    base.write_text(''.join(l + '\n' for l in lines)); log.append([evt(3), 'not json', evt(3)])
+    report = receipts.validate(log, workers=2, chunk_bytes=300)
+    assert report["error_count"] == 6 and report["lines"] == 43 + 3
+    assert report["errors"][:2] == [f'{base}:7: out of order', f'{base}:22: duplicate of the previous line']
+    assert report["errors"][2].startswith(f'{base}:32: schema:') and report["errors"][-1] == f'{log.active}:3: duplicate line'
+    assert len(receipts.validate(log, max_errors=2, workers=1)["errors"]) == 2
+def test_open_reader_keeps_its_base_across_reset_and_compact(tmp_path):
+    base = tmp_path/'events.jsonl'; log = ReceiptLog(base)
+    evt = lambda pid, day: json.dumps({"observed_at":f"2025-09-{day:02d}T00:00:00Z","provider_id":pid}, sort_keys=True)
+    log.reset([evt("b", 2), evt("c", 3)])
+    reader = log.reader(); digest = reader.digest()
+    log.reset([evt("a", 1), evt("b", 2), evt("c", 3)])   # shifts every offset the reader's index holds
+    assert reader.receipts_for(["c"]) == {"c": [json.loads(evt("c", 3))]} and reader.lines_between(None, "2025-09-30") == [evt("b", 2), evt("c", 3)]
+    log.append([evt("a", 0)]); log.compact()
+    assert reader.receipts_for(["b"]) == {"b": [json.loads(evt("b", 2))]} and reader.digest() == digest
+    reader.close()
+    assert log.receipts_for(["a", "c"]) == {"a": [json.loads(evt("a", 0)), json.loads(evt("a", 1))], "c": [json.loads(evt("c", 3))]}
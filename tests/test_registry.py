@@ -0,0 +1,42 @@
+import json, os
+import numpy as np
+import pytest
+from cli import registry
+from cli.columnar import Columns
+PROVIDERS = [{"provider_id":"a","name":"A","postcode":"2000","lat":-33.9,"lng":151.2,"price_per_day":95.5,"tags":["respite","memory_support"]},
+             {"provider_id":"b","name":"B","postcode":2010,"lat":None,"rad":500000,"mpir":8.36,"star_overall":4.5,"tags":["respite"]},
+             {"provider_id":"ü","name":"C","postcode":"2611.0","tags":[]}]
+def test_compiled_registry_matches_json(tmp_path):
+    src, out = tmp_path/'providers.json', tmp_path/'registry.bin'
+    src.write_text(json.dumps(PROVIDERS)); os.utime(src, ns=(10**18, 10**18))
+    cols, ref = registry.load(src, out, overlay=None).columns(), Columns.from_providers(PROVIDERS)
+    assert list(cols.provider_ids) == ref.provider_ids and cols.provider_ids[1:][1] == "ü" and cols.tag_vocab == ref.tag_vocab
+    assert np.array_equal(cols.tag_bits, ref.tag_bits)
+    assert cols.rows_with({'respite'}).tolist() == [0, 1] and cols.rows_with({'respite', 'memory_support'}).tolist() == [0]
+    for name in registry.FLOATS: assert np.array_equal(getattr(cols, name), getattr(ref, name), equal_nan=True)
+    assert [cols.take([2, 0]).provider_ids, len(cols.slice(1, 3))] == [["ü", "a"], 2]
+    src.write_text(json.dumps(PROVIDERS[:2]))
+    assert len(registry.load(src, out, overlay=None)) == 2 and registry.CompiledRegistry(out).source_stat == (0, 0, 0)
+    src.write_text(json.dumps([{"provider_id": "x", "postcode": "2000"}]))
+    with pytest.raises(ValueError, match="'name' is a required property"): registry.load(src, out, overlay=None)
+def test_overlay_is_merged_by_provider_id(tmp_path):
+    src, out, overlay = tmp_path/'providers.json', tmp_path/'registry.bin', tmp_path/'overlay.json'
+    src.write_text(json.dumps(PROVIDERS))
+    overlay.write_text(json.dumps({"b": {"fields": {"rad": 600000, "mpir": 7.5, "star_overall": 3.0}, "sources": {}},
+                                   "zz": {"fields": {"star_overall": 1.0}, "sources": {}}}))
+    cols = registry.load(src, out, overlay=overlay).columns()
+    assert cols.rad[1] == 600000 and cols.star_overall[1] == 3.0 and np.isnan(cols.star_overall[2])
+    assert cols.price[1] == 123.29 and len(cols) == 3
+    overlay.write_text(json.dumps({}))
+    assert registry.load(src, out, overlay=overlay).columns().rad[1] == 500000
+def test_compiled_columns_rank_in_a_process_pool(tmp_path):
+    from cli.columnar import best, best_parallel
+    src, out = tmp_path/'providers.json', tmp_path/'registry.bin'
+    providers = [{"provider_id":f"p{i:03}","name":"x","postcode":"2000","lat":-33.87+i*1e-3,"lng":151.2,
+                  "price_per_day":60+i%40,"star_overall":[None,3.0,4.5][i%3],"tags":["respite"][:i%2]} for i in range(200)]
+    src.write_text(json.dumps(providers))
+    cols = registry.load(src, out, overlay=None).columns()
+    params = ({"lat": -33.9, "lng": 151.2}, 20.0, 80.0, {"respite"}, {"w_location":0.3,"w_needs":0.1,"w_price":0.3,"w_quality":0.3}, "any")
+    ref = best(Columns.from_providers(providers), params, 5)
+    assert best_parallel(cols, params, 5, 2) == best(cols, params, 5) == ref
+    assert best_parallel(cols.slice(10, 150), params, 3, 2) == best(cols.slice(10, 150), params, 3)
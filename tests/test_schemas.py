@@ -1,6 +1,7 @@
 import json, subprocess, sys
 from pathlib import Path
 from jsonschema import validate
+from cli.receipts import ReceiptLog
 ROOT = Path(__file__).resolve().parents[1]
 def test_schema_validity():
     providers=json.loads((ROOT/'registry'/'providers.json').read_text())
@@ -12,5 +13,8 @@ def test_schema_validity():
     top5_schema=json.loads((ROOT/'schemas'/'top5.schema.json').read_text())
     validate(top5, top5_schema)
     event_schema=json.loads((ROOT/'schemas'/'event.schema.json').read_text())
-    for ln in (ROOT/'receipts'/'events.jsonl').read_text().splitlines():
-        if ln.strip(): validate(json.loads(ln), event_schema)
+    # merged view: score_run receipts live in receipts/segments/, not the base file
+    kinds=set()
+    for ln in ReceiptLog().lines():
+        if ln.strip(): evt=json.loads(ln); validate(evt, event_schema); kinds.add(evt['kind'])
+    assert 'score_run' in kinds
@@ -0,0 +1,18 @@
+import json, subprocess, sys
+from pathlib import Path
+from jsonschema import Draft202012Validator
+from cli.serve import App
+ROOT = Path(__file__).resolve().parents[1]
+def test_service_matches_cli_and_rejects_bad_queries():
+    for m in ('cli.ingest', 'cli.score'): subprocess.check_call([sys.executable, '-m', m], cwd=ROOT)
+    app = App()
+    status, body = app.handle('GET', '/top5?postcode=2000&radius_km=20&budget_per_day=90&needs=memory_support&preset=balanced')
+    assert status == 200 and body == (ROOT/'rankings'/'top5.json').read_bytes()
+    assert app.handle('GET', '/top5?postcode=2000&radius_km=nan')[0] == 400
+    assert app.handle('GET', '/top5?postcode=2000&preset=nope')[0] == 400
+    status, body = app.handle('GET', '/top5?postcode=2000&must_have=nope')   # hard filter, nothing matches
+    out, schema = json.loads(body), Draft202012Validator(json.loads((ROOT/'schemas'/'top5.schema.json').read_text()))
+    assert status == 200 and out['items'] == [] and schema.is_valid(out)
+    del out['query']['must_have']; assert not schema.is_valid(out)   # empty items only for must_have
+    assert app.handle('GET', '/nowhere')[0] == 404 and app.handle('POST', '/top5')[0] == 405
+    assert json.loads(app.handle('GET', '/healthz')[1])['ok'] and not app.changed()
@@ -0,0 +1,33 @@
+import random
+import numpy as np
+from cli.columnar import Columns, haversine_km
+from cli.spatial import GridIndex, load_or_build
+def test_grid_matches_brute_force(tmp_path):
+    r = random.Random(3)
+    cols = Columns.from_providers([{"provider_id":str(i),"lat":r.uniform(-89.5,89.5),"lng":r.uniform(-180,180)} for i in range(5000)]
+                                  + [{"provider_id":"nowhere","lat":None,"lng":None}])
+    idx = load_or_build(tmp_path/'spatial.npz', cols, 'abc', cell_deg=1.0)
+    assert load_or_build(tmp_path/'spatial.npz', cols, 'abc', cell_deg=1.0).cells.tolist() == idx.cells.tolist()
+    for _ in range(200):
+        origin = {"lat":r.uniform(-89,89),"lng":r.uniform(-180,180)}; radius = r.choice([5,50,500,3000,12000])
+        ref = np.flatnonzero(haversine_km(origin["lat"], origin["lng"], cols.lat, cols.lng) <= radius)
+        assert idx.within(cols, origin, radius).tolist() == ref.tolist()
+    assert GridIndex.load(tmp_path/'spatial.npz').registry_sha256 == 'abc'
+def test_prefiltered_rank_equals_full_registry():
+    from cli.columnar import best
+    from cli.common import json_bytes
+    from cli.receipts import ReceiptLog
+    from cli.score import Registry, rank, output, needs_params
+    registry = Registry.load(); reader = ReceiptLog().reader(); r = random.Random(9)
+    pcs = ['0810', '2000', '2611', '6000', '7000', '4350', '2444']
+    weights = [{"w_location":0.3,"w_needs":0.1,"w_price":0.3,"w_quality":0.3}, {"w_location":0.9,"w_needs":0.0,"w_price":0.05,"w_quality":0.05},
+               {"w_location":0.05,"w_needs":0.0,"w_price":0.6,"w_quality":0.35}]
+    for _ in range(60):
+        q = {"postcode": r.choice(pcs), "radius_km": r.choice([0.01, 1, 5, 20, 200]), "budget_per_day": r.choice([40, 90, 300]),
+             "needs": ["memory_support"], "margin_km": r.choice([0, 10])}
+        w = r.choice(weights); k = r.choice([1, 5, 20])
+        needs, _, match = needs_params(q)
+        params = (registry.postcodes.origin(q["postcode"]), float(q["radius_km"]), float(q["budget_per_day"]), needs, w, match)
+        full = output(registry.cols.provider_ids, q, "X", reader.latest_observed(), best(registry.cols, params, k), reader, k)
+        assert json_bytes(rank(registry, q, w, "X", reader, k=k)) == json_bytes(full)
+    assert len(rank(registry, {"postcode": "0810", "radius_km": 1, "budget_per_day": 100, "needs": []}, weights[0], "X", reader)["items"]) == 5
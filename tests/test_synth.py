@@ -0,0 +1,16 @@
+from cli import synth
+from cli.bench import compare
+def test_generators_are_deterministic(tmp_path):
+    a, b = synth.registry(300, seed=7), synth.registry(300, seed=7)
+    assert a == b and a != synth.registry(300, seed=8) and len({p["provider_id"] for p in a}) == 300
+    assert any("rad" in p for p in a) and any("price_per_day" in p for p in a) and any(p["tags"] for p in a)
+    assert synth.corpus(20, tmp_path/'a', seed=7) == synth.corpus(20, tmp_path/'b', seed=7)
+    assert [f.read_bytes() for f in sorted((tmp_path/'a').rglob('*.txt'))] == [f.read_bytes() for f in sorted((tmp_path/'b').rglob('*.txt'))]
+    lines = synth.receipts(50, 300, seed=7)
+    assert lines == synth.receipts(50, 300, seed=7) and all(l.startswith('{"kind":"doc_ingest"') for l in lines)
+def test_compare_flags_regressions_over_threshold():
+    run = lambda wall, rss: {"scales": {"1000": {"stages": {"score": {"wall_s": wall, "peak_rss_kb": rss}}}}}
+    assert compare(run(1.2, 100), run(1.0, 100), 0.25) == []
+    assert compare(run(1.3, 100), run(1.0, 100), 0.25) == ['1000 score wall_s: 1.0 -> 1.3 (+30%)']
+    assert compare(run(0.2, 200), run(0.1, 100), 0.25) == ['1000 score peak_rss_kb: 100 -> 200 (+100%)']
+    assert compare(run(9.0, 900), {"scales": {}}) == []
@@ -0,0 +1,13 @@
+// Browser check of a `python -m cli.digest prove` proof against a published
+// ledger digest's merkle_root (see cli/merkle.py for the hash layout).
+const hex=b=>[...new Uint8Array(b)].map(x=>x.toString(16).padStart(2,'0')).join('');
+const unhex=h=>new Uint8Array(h.match(/../g).map(x=>parseInt(x,16)));
+const sha=async(...parts)=>{const n=parts.reduce((a,p)=>a+p.length,0),buf=new Uint8Array(n);let o=0;for(const p of parts){buf.set(p,o);o+=p.length;}return new Uint8Array(await crypto.subtle.digest('SHA-256',buf));};
+const u64=c=>{const b=new Uint8Array(8);new DataView(b.buffer).setBigUint64(0,BigInt(c));return b;};
+const node=(lo,leaf,count,hi)=>sha(Uint8Array.of(1),lo,leaf,u64(count),hi);
+async function verifyProof(proof,merkleRoot){
+  const leaf=await sha(Uint8Array.of(0),new TextEncoder().encode(proof.line));
+  let h=await node(unhex(proof.lo),leaf,proof.count,unhex(proof.hi));
+  for(const s of proof.path){const sib=unhex(s.sibling),lf=unhex(s.leaf);h=s.side==='lo'?await node(h,lf,s.count,sib):await node(sib,lf,s.count,h);}
+  return hex(h)===merkleRoot;
+}